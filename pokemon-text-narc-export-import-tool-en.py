@@ -7,18 +7,139 @@ This version is in English.
 """
 
 import argparse
+import cProfile
+import heapq
+import hashlib
+import io
 import json
+import math
+import mmap
+import queue
+import re
+import shutil
+import socket
+import socketserver
+import sqlite3
+import stat
+import os
 import struct
 import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext, redirect_stdout
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import islice, zip_longest
 from pathlib import Path
-from random import randint
+from random import Random, randint
+from typing import Optional
+from urllib.parse import urlsplit
+
+IOV_MAX = 1024
 
 # ---------- Helper functions and base classes ---------- #
 
-def pad32(b: bytearray) -> None:
-    """Pads a bytearray to be divisible by 4."""
-    while len(b) % 4:
-        b += b'\xFF'
+def pad32(size: int) -> bytes:
+    """Returns the padding that makes a length of `size` divisible by 4."""
+    return b'\xFF' * (-size % 4)
+
+def write_vectored(f, chunks: list) -> None:
+    """Writes a list of buffers with os.writev where available, retrying short writes."""
+    if not hasattr(os, 'writev'):
+        f.writelines(chunks); return
+    views = [memoryview(c).cast('B') for c in chunks if len(c)]
+    while views:
+        n = os.writev(f.fileno(), views[:IOV_MAX])
+        while n:
+            if n >= len(views[0]): n -= len(views.pop(0))
+            else: views[0] = views[0][n:]; n = 0
+
+def worker_pool(jobs: int):
+    """A process pool with `jobs` workers (0 = one per core), or a no-op context for single-process runs."""
+    jobs = jobs or os.cpu_count() or 1
+    return ProcessPoolExecutor(jobs) if jobs > 1 else nullcontext()
+
+def payloads(entries, pool=None):
+    """Entries in a form that can be sent to `pool` (memoryview slices are not picklable)."""
+    return entries if pool is None else map(bytes, entries)
+
+def map_entries(fn, items, pool=None, chunk: int = 16):
+    """Applies `fn` to every item in order; with a pool, items are fanned out in chunks, one bounded window at a time."""
+    if pool is None:
+        yield from map(fn, items); return
+    items = iter(items)
+    while batch := list(islice(items, chunk * 64)):
+        yield from pool.map(fn, batch, chunksize=chunk)
+
+def timed_call(fn, item):
+    """Calls fn(item) and returns (elapsed seconds, result); picklable, so the timing also works in worker processes."""
+    start = time.perf_counter()
+    result = fn(item)
+    return time.perf_counter() - start, result
+
+class Stats:
+    """Per-phase metrics (wall time, bytes, entries, strings) and the slowest entries; cheap enough to always collect."""
+    SLOWEST = 10
+
+    def __init__(self):
+        self.phases = {}
+        self.slowest = []
+
+    def record(self, name: str) -> dict:
+        return self.phases.setdefault(name, {'seconds': 0.0, 'bytes': 0, 'entries': 0, 'strings': 0})
+
+    @contextmanager
+    def phase(self, name: str):
+        rec = self.record(name); start = time.perf_counter()
+        try: yield rec
+        finally: rec['seconds'] += time.perf_counter() - start
+
+    def entry(self, name: str, index: int, seconds: float, strings: int = 0, nbytes: int = 0) -> None:
+        rec = self.record(name)
+        rec['seconds'] += seconds; rec['entries'] += 1; rec['strings'] += strings; rec['bytes'] += nbytes
+        item = (seconds, name, index)
+        if len(self.slowest) < self.SLOWEST: heapq.heappush(self.slowest, item)
+        elif item > self.slowest[0]: heapq.heapreplace(self.slowest, item)
+
+    def timed_iter(self, name: str, items):
+        """Yields from `items`, adding the time spent producing them to phase `name`."""
+        rec, items = self.record(name), iter(items)
+        while True:
+            start = time.perf_counter()
+            try: item = next(items)
+            except StopIteration: return
+            finally: rec['seconds'] += time.perf_counter() - start
+            rec['entries'] += 1; rec['strings'] += len(item)
+            yield item
+
+    def as_dict(self) -> dict:
+        return {'phases': {k: {**v, 'seconds': round(v['seconds'], 6)} for k, v in self.phases.items()},
+                'slowest': [{'phase': n, 'entry': i, 'seconds': round(t, 6)} for t, n, i in sorted(self.slowest, reverse=True)]}
+
+    def report(self) -> str:
+        lines = [f"[STATS] {'Phase':<10} {'Time (ms)':>10} {'Bytes':>12} {'Entries':>8} {'Strings':>9}"]
+        for name, rec in self.phases.items():
+            lines.append(f"        {name:<10} {rec['seconds'] * 1000:>10.2f} {rec['bytes']:>12} {rec['entries']:>8} {rec['strings']:>9}")
+        if self.slowest: lines.append("[STATS] Slowest entries: " + ", ".join(f"{n} #{i:04d} ({t * 1000:.2f} ms)" for t, n, i in sorted(self.slowest, reverse=True)))
+        return "\n".join(lines)
+
+STATS = Stats()
+
+def copy_file(src: str, dst: str) -> None:
+    """Copies a file inside the kernel (copy_file_range, which can reflink on CoW filesystems) where possible."""
+    if not hasattr(os, 'copy_file_range'):
+        shutil.copyfile(src, dst); return
+    with open(src, 'rb') as fin, open(dst, 'wb') as fout:
+        try:
+            while os.copy_file_range(fin.fileno(), fout.fileno(), 1 << 30): pass
+        except OSError:
+            fin.seek(0); fout.seek(0); fout.truncate(); shutil.copyfileobj(fin, fout)
 
 class DS:
     """Simplified DataStream for reading and writing binary data."""
@@ -36,79 +157,282 @@ class DS:
 
 class NARC:
     """Class for reading and rebuilding NARC archives."""
+    CACHE_SIZE = 64
+
     def __init__(self):
         self.entries = []
+        self.btaf = self.gmif = self.gmif_size = self.size = 0
+        self.offsets = []
+        self._map = None
+        self._strings = OrderedDict()
 
     @classmethod
-    def open(cls, fn: str):
-        raw = Path(fn).read_bytes()
-        if raw[0:4] != b'NARC': raise ValueError(f"'{fn}' is not a valid NARC file.")
-        btaf = raw.find(b'BTAF')
-        if btaf == -1: raise ValueError("Missing BTAF block in NARC file.")
-        files = struct.unpack_from('<I', raw, btaf + 8)[0]
-        offs = [struct.unpack_from('<II', raw, btaf + 12 + i*8) for i in range(files)]
-        gmif = raw.find(b'GMIF')
-        if gmif == -1: raise ValueError("Missing GMIF block in NARC file.")
-        gmif_data_start = gmif + 8
+    def open(cls, fn: str, lazy: bool = False):
+        """Opens a NARC. With `lazy`, the file is memory-mapped and entries are zero-copy memoryview slices."""
+        if lazy:
+            with open(fn, 'rb') as f: raw = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else: raw = Path(fn).read_bytes()
         nar = cls()
-        for s, e in offs: nar.entries.append(raw[gmif_data_start + s: gmif_data_start + e])
+        try:
+            if raw[0:4] != b'NARC': raise ValueError(f"'{fn}' is not a valid NARC file.")
+            btaf = raw.find(b'BTAF')
+            if btaf == -1: raise ValueError("Missing BTAF block in NARC file.")
+            files = struct.unpack_from('<I', raw, btaf + 8)[0]
+            offs = [struct.unpack_from('<II', raw, btaf + 12 + i*8) for i in range(files)]
+            gmif = raw.find(b'GMIF')
+            if gmif == -1: raise ValueError("Missing GMIF block in NARC file.")
+            gmif_size = struct.unpack_from('<I', raw, gmif + 4)[0]
+        except Exception:
+            if lazy: raw.close()
+            raise
+        gmif_data_start = gmif + 8
+        nar.btaf, nar.gmif, nar.gmif_size, nar.size, nar.offsets = btaf, gmif, gmif_size, len(raw), offs
+        view = raw
+        if lazy: nar._map = raw; view = memoryview(raw)
+        for s, e in offs: nar.entries.append(view[gmif_data_start + s: gmif_data_start + e])
         return nar
 
-    def rebuild(self, new_entries: list[bytes]) -> bytes:
+    def patch(self, fn: str, new_entries: list[bytes], first: int) -> int:
+        """Rewrites `fn` (this archive or a copy of it) in place from entry `first` onward: the GMIF tail, the BTAF
+        offsets and the header sizes. Bytes before the first changed entry are not touched. Returns the bytes written."""
+        if self.gmif + self.gmif_size != self.size or len(new_entries) != len(self.offsets):
+            raise ValueError("The archive layout does not allow patching in place.")
+        data_start = self.gmif + 8
+        start = cur = self.offsets[first][0]
+        table = array('I')
+        for e in new_entries[first:]:
+            table.append(cur); cur += len(e); table.append(cur)
+        if sys.byteorder == 'big': table.byteswap()
+        total = data_start + cur + -(data_start + cur) % 4
+        tail = b''.join([*new_entries[first:], pad32(data_start + cur)])
+        self.close()
+        with STATS.phase('write') as rec, open(fn, 'r+b') as f:
+            f.seek(data_start + start); f.write(tail); f.truncate(total)
+            f.seek(self.btaf + 12 + first * 8); f.write(table.tobytes())
+            f.seek(8); f.write(struct.pack('<I', total))
+            f.seek(self.gmif + 4); f.write(struct.pack('<I', total - self.gmif))
+            written = len(tail) + len(table) * 4 + 8
+            rec['bytes'] += written
+        return written
+
+    def strings(self, i: int) -> list[str]:
+        """Decoded strings of entry `i`; decoded on first access and kept in a bounded LRU cache."""
+        if i in self._strings:
+            self._strings.move_to_end(i); return self._strings[i]
+        texts = self._strings[i] = TxtCodec.get_strings(self.entries[i])
+        if len(self._strings) > self.CACHE_SIZE: self._strings.popitem(last=False)
+        return texts
+
+    def close(self):
+        """Releases the memory map of a lazily opened archive."""
+        if self._map is None: return
+        for e in self.entries: e.release()
+        self.entries = []; self._strings.clear()
+        self._map.close(); self._map = None
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()
+
+    @staticmethod
+    def layout(sizes: list[int]) -> bytes:
+        """Builds the header, BTAF, BTNF and GMIF header for entries of the given sizes."""
         out = DS()
         out.w(b'NARC'); out.w16(0xFFFE); out.w16(0x0100); out.w32(0); out.w16(0x10); out.w16(3)
-        btaf_start = len(out.d); out.w(b'BTAF'); out.w32(0); out.w32(len(new_entries))
+        btaf_start = len(out.d); out.w(b'BTAF'); out.w32(0); out.w32(len(sizes))
         cur = 0
-        for e in new_entries:
-            out.w32(cur); cur += len(e); out.w32(cur)
+        for size in sizes:
+            out.w32(cur); cur += size; out.w32(cur)
         out.w(b'BTNF'); out.w32(0x10); out.w32(4); out.w16(0x10000); out.w16(1)
         gmif_start = len(out.d); out.w(b'GMIF'); out.w32(0)
-        for e in new_entries: out.w(e)
-        pad32(out.d)
-        total = len(out.d)
+        total = len(out.d) + cur; total += -total % 4
         struct.pack_into('<I', out.d, 8, total)
         struct.pack_into('<I', out.d, btaf_start + 4, gmif_start - btaf_start)
         struct.pack_into('<I', out.d, gmif_start + 4, total - gmif_start)
         return bytes(out.d)
 
+    def rebuild(self, new_entries: list[bytes]) -> bytes:
+        head = self.layout([len(e) for e in new_entries])
+        size = len(head) + sum(len(e) for e in new_entries)
+        return b''.join([head, *new_entries, pad32(size)])
+
+    def write(self, fn: str, new_entries: list[bytes]) -> int:
+        """Streams a rebuilt archive to `fn` with vectored writes, without building it in memory. Returns the file size."""
+        with STATS.phase('rebuild') as rec:
+            head = self.layout([len(e) for e in new_entries])
+            size = len(head) + sum(len(e) for e in new_entries)
+            rec['entries'] += len(new_entries); rec['bytes'] += size + -size % 4
+        tmp = Path(fn).with_name(Path(fn).name + '.tmp')
+        try:
+            with STATS.phase('write') as rec, open(tmp, 'wb', buffering=0 if hasattr(os, 'writev') else -1) as f:
+                rec['bytes'] += size + -size % 4
+                write_vectored(f, [head])
+                for i in range(0, len(new_entries), IOV_MAX): write_vectored(f, new_entries[i:i + IOV_MAX])
+                write_vectored(f, [pad32(size)])
+            os.replace(tmp, fn)
+        except BaseException:
+            tmp.unlink(missing_ok=True); raise
+        return size + -size % 4
+
 # ---------- Text Encoding (IMPORT) and Decoding (EXPORT) ---------- #
 
+class EscapeCodec:
+    """Converts between code units and exported text, where units that are not plain text are written as \\xNNNN.
+    Import is a compiled-regex tokenizer; export decodes whole strings at once and escapes control-code runs in bulk."""
+    CANDIDATE = re.compile(r'\\x(.{4})?', re.S)
+    ESCAPE = re.compile(r'\\x([0-9a-fA-F]{4})')
+    HEX4 = re.compile(r'[0-9a-fA-F]{4}')
+    ESCAPED = re.compile('[\x00-\x1f\uf000\ud800-\udfff\ufff1-\uffff\U00010000-\U0010ffff]+')
+    RUN_CACHE_SIZE = 4096
+    _runs: dict[str, str] = {}
+
+    @staticmethod
+    def literal(text: str) -> array:
+        """Code units of plain text (characters above U+FFFF are truncated to 16 bits, like ord(c) & 0xFFFF)."""
+        if not text: return array('H')
+        if max(text) > '\uffff': return array('H', [ord(c) & 0xFFFF for c in text])
+        units = array('H', text.encode('utf-16-le', 'surrogatepass'))
+        if sys.byteorder == 'big': units.byteswap()
+        return units
+
+    @classmethod
+    def encode(cls, text: str, strict: bool = False) -> array:
+        """Parses \\xNNNN escapes. Lenient mode matches the historical parser (anything int(..., 16) accepts, otherwise
+        the backslash is kept as text); strict mode only accepts four hex digits and raises ValueError otherwise."""
+        if '\\x' not in text: return cls.literal(text)
+        plain = cls.ESCAPE.sub(lambda m: chr(int(m.group(1), 16)), text)
+        if '\\x' not in plain: return cls.literal(plain)
+        units, pos = array('H'), 0
+        while (m := cls.CANDIDATE.search(text, pos)):
+            digits, value = m.group(1), None
+            if digits is not None:
+                if cls.HEX4.fullmatch(digits): value = int(digits, 16)
+                elif not strict:
+                    try: value = int(digits, 16) & 0xFFFF
+                    except ValueError: pass
+            if value is None:
+                if strict: raise ValueError(f"Invalid escape sequence at position {m.start()}: {text[m.start():m.start() + 6]!r}")
+                units.extend(cls.literal(text[pos:m.start() + 1])); pos = m.start() + 1; continue
+            units.extend(cls.literal(text[pos:m.start()])); units.append(value); pos = m.end()
+        units.extend(cls.literal(text[pos:]))
+        return units
+
+    @classmethod
+    def escape_run(cls, m) -> str:
+        """Escapes a run of non-text units; runs are cached, since the same control codes recur throughout a game."""
+        run = m.group()
+        text = cls._runs.get(run)
+        if text is None:
+            units = array('H', run.encode('utf-16-le', 'surrogatepass'))
+            if sys.byteorder == 'big': units.byteswap()
+            text = ''.join(f"\\x{c:04x}" for c in units if c != 0xFFFF)
+            if len(cls._runs) < cls.RUN_CACHE_SIZE: cls._runs[run] = text
+        return text
+
+    @classmethod
+    def decode(cls, units: array) -> str:
+        """Turns code units into exported text: 0xFFFF is dropped, control and surrogate units become \\xNNNN."""
+        if sys.byteorder == 'big': units = array('H', units); units.byteswap()
+        return cls.ESCAPED.sub(cls.escape_run, units.tobytes().decode('utf-16-le', 'surrogatepass'))
+
+class StringTable:
+    """The decoded strings of one entry: code units in one shared array('H'), with offsets and lengths in arrays.
+    Strings are only turned into escaped `str` on access; otherwise it behaves like a read-only list of them."""
+    __slots__ = ('units', 'offsets', 'lengths')
+
+    def __init__(self, units: Optional[array] = None, offsets: Optional[array] = None, lengths: Optional[array] = None):
+        self.units = array('H') if units is None else units
+        self.offsets = array('I') if offsets is None else offsets
+        self.lengths = array('I') if lengths is None else lengths
+
+    def __len__(self) -> int: return len(self.lengths)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice): return [self[k] for k in range(*i.indices(len(self)))]
+        start = self.offsets[i]
+        return EscapeCodec.decode(self.units[start:start + self.lengths[i]])
+
+    def __iter__(self):
+        for start, count in zip(self.offsets, self.lengths): yield EscapeCodec.decode(self.units[start:start + count])
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, StringTable) and (self.units, self.offsets, self.lengths) == (other.units, other.offsets, other.lengths): return True
+        if not isinstance(other, (StringTable, list, tuple)): return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    __hash__ = None
+
+    def __repr__(self) -> str: return f"StringTable({list(self)!r})"
+
 class TxtCodec:
     INIT_KEY = 0x1234
+    _cycles: dict[int, bytes] = {}
 
     @staticmethod
-    def get_strings(data: bytes) -> list[str]:
-        if len(data) < 12: return []
-        ds = DS(data)
+    def rotate(key: int) -> int: return ((key >> 3) | (key << 13)) & 0xFFFF
+
+    @classmethod
+    def keystream(cls, key: int, count: int) -> bytes:
+        """Little-endian keys for `count` words, the last one XORed with `key`. The rotation has a period of 16, so only
+        the 32-byte cycle of each key is cached and tiled on demand."""
+        cycle = cls._cycles.get(key)
+        if cycle is None:
+            words, k = [], key
+            for _ in range(16): words.append(k); k = cls.rotate(k)
+            cycle = cls._cycles[key] = struct.pack('<16H', *reversed(words))
+        ks = cycle * -(-count // 16)
+        return ks[len(ks) - count * 2:]
+
+    @staticmethod
+    def xor(data: bytes, keys: bytes) -> bytes:
+        """XORs two equally long buffers in a single big-integer operation."""
+        return (int.from_bytes(data, 'little') ^ int.from_bytes(keys, 'little')).to_bytes(len(data), 'little')
+
+    @staticmethod
+    def to_words(data: bytes) -> array:
+        words = array('H', data)
+        if sys.byteorder == 'big': words.byteswap()
+        return words
+
+    @staticmethod
+    def from_words(words: array) -> bytes:
+        if sys.byteorder == 'big': words = array('H', words); words.byteswap()
+        return words.tobytes()
+
+    @classmethod
+    def decrypt(cls, data: bytes, spans: list[tuple[int, int]]) -> array:
+        """Decrypts every (start, count) string of an entry in one pass, returning the concatenated code units."""
+        raw, keys = [], []
+        for start, count in spans:
+            if not count: continue
+            end = start + count * 2
+            raw.append(data[start:end])
+            keys.append(cls.keystream(struct.unpack_from('<H', data, end - 2)[0] ^ 0xFFFF, count))
+        return cls.to_words(cls.xor(b''.join(raw), b''.join(keys)))
+
+    @classmethod
+    def get_strings(cls, data: bytes) -> StringTable:
+        if len(data) < 12: return StringTable()
         try:
-            ds.seek(2); num_entries = ds.r16(); ds.seek(12)
-            section_offset = ds.r32()
-            if section_offset >= len(data): return []
-            ds.seek(section_offset); ds.r32()
-            table = []
-            for _ in range(num_entries):
-                if ds.remaining() < 8: break
-                table.append({'offset': ds.r32(), 'count': ds.r16()})
-                ds.seek(ds.tell() + 2)
-            strings = []
-            for entry in table:
-                text_start = section_offset + entry['offset']
-                if text_start + (entry['count'] * 2) > len(data): continue
-                ds.seek(text_start)
-                enc_chars = [ds.r16() for _ in range(entry['count'])]
-                if not enc_chars:
-                    strings.append(""); continue
-                key = enc_chars[-1] ^ 0xFFFF
-                for k in range(len(enc_chars) - 1, -1, -1):
-                    enc_chars[k] ^= key
-                    if k > 0: key = ((key >> 3) | (key << 13)) & 0xFFFF
-                decoded_str = "".join(chr(c) if 0x20 <= c <= 0xFFF0 and c != 0xF000 and not (0xD800 <= c <= 0xDFFF) else f"\\x{c:04x}" for c in enc_chars if c != 0xFFFF)
-                strings.append(decoded_str)
-            return strings
-        except (IndexError, struct.error): return []
+            num_entries, section_offset = struct.unpack_from('<H', data, 2)[0], struct.unpack_from('<I', data, 12)[0]
+            if section_offset + 4 > len(data): return StringTable()
+            table_start = section_offset + 4
+            num_entries = min(num_entries, (len(data) - table_start) // 8)
+            spans = [(section_offset + offset, count) for offset, count in struct.iter_unpack('<IH2x', data[table_start:table_start + num_entries * 8])]
+            spans = [(start, count) for start, count in spans if start + count * 2 <= len(data)]
+            offsets, lengths = array('I'), array('I', [count for _, count in spans])
+            pos = 0
+            for count in lengths: offsets.append(pos); pos += count
+            return StringTable(cls.decrypt(data, spans), offsets, lengths)
+        except (IndexError, struct.error): return StringTable()
+
+    @staticmethod
+    def codes_to_txt(codes) -> str:
+        """Reference decoder for EscapeCodec.decode (one code unit at a time)."""
+        return "".join(chr(c) if 0x20 <= c <= 0xFFF0 and c != 0xF000 and not (0xD800 <= c <= 0xDFFF) else f"\\x{c:04x}" for c in codes if c != 0xFFFF)
 
     @staticmethod
     def txt_to_codes(txt: str) -> list[int]:
+        """Reference parser for EscapeCodec.encode in lenient mode (one character at a time)."""
         codes, i = [], 0
         while i < len(txt):
             if txt[i:i+2] == '\\x' and i+5 < len(txt):
@@ -121,23 +445,23 @@ class TxtCodec:
     @classmethod
     def encrypt(cls, codes: list[int]) -> bytes:
         if not codes: return b''
-        k = cls.INIT_KEY; keys = {}
-        for idx in range(len(codes), -1, -1):
-            keys[idx] = k
-            if idx: k = ((k >> 3) | (k << 13)) & 0xFFFF
-        enc = [(c ^ keys[i]) & 0xFFFF for i, c in enumerate(codes)]
-        enc.append(cls.INIT_KEY ^ 0xFFFF)
-        return struct.pack(f'<{len(enc)}H', *enc)
+        plain = array('H', codes); plain.append(0xFFFF)
+        return cls.xor(cls.from_words(plain), cls.keystream(cls.INIT_KEY, len(plain)))
 
     @classmethod
-    def build_entry(cls, texts: list[str]) -> bytes:
-        chunks = [cls.encrypt(cls.txt_to_codes(t)) for t in texts]
+    def build_entry(cls, texts: list[str], strict: bool = False) -> bytes:
+        plain, keys, sizes = array('H'), [], []
+        for t in texts:
+            codes = EscapeCodec.encode(t, strict)
+            if codes: plain.extend(codes); plain.append(0xFFFF); keys.append(cls.keystream(cls.INIT_KEY, len(codes) + 1))
+            sizes.append(len(codes) + 1 if codes else 0)
+        strings = cls.xor(cls.from_words(plain), b''.join(keys))
         section_builder = DS(); section_builder.w32(0)
         offset = 4 + len(texts) * 8
-        for chunk in chunks:
-            section_builder.w32(offset); section_builder.w16(len(chunk) // 2); section_builder.w16(0x0100)
-            offset += len(chunk)
-        for chunk in chunks: section_builder.w(chunk)
+        for size in sizes:
+            section_builder.w32(offset); section_builder.w16(size); section_builder.w16(0x0100)
+            offset += size * 2
+        section_builder.w(strings)
         struct.pack_into('<I', section_builder.d, 0, len(section_builder.d))
         entry_header = DS()
         entry_header.w16(1); entry_header.w16(len(texts)); entry_header.w32(len(section_builder.d))
@@ -146,51 +470,950 @@ class TxtCodec:
 
 # ---------- Export and Import Helper Functions ---------- #
 
-def export_to_json(narc: NARC, json_path: str):
-    data = {'entries': [{'entry_index': i, 'texts': [{'text_index': j, 'original_text': t, 'translated_text': t} for j, t in enumerate(TxtCodec.get_strings(b))]} for i, b in enumerate(narc.entries)]}
+def write_json_entries(json_path: str, entries) -> None:
+    """Writes {"entries": [...]} one entry at a time, formatted exactly like json.dump(..., indent=2)."""
     with open(json_path, 'w', encoding='utf-8', errors='surrogatepass') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.write('{\n  "entries": [')
+        empty = True
+        for entry in entries:
+            f.write('\n    ' if empty else ',\n    ')
+            f.write(json.dumps(entry, ensure_ascii=False, indent=2).replace('\n', '\n    '))
+            empty = False
+        f.write(']\n}' if empty else '\n  ]\n}')
+
+def iter_json_entries(json_path: str, chunk_size: int = 1 << 16):
+    """Yields the objects of the "entries" array (or of a top-level array) one by one, reading the file incrementally.
+    Parse errors report their position in the whole file, like json.load."""
+    decoder = json.JSONDecoder()
+    with open(json_path, encoding='utf-8', errors='surrogatepass') as f:
+        buf, pos, eof = '', 0, False
+        base, line, col = 0, 1, 1  # position of buf[0] in the file
+
+        def more() -> bool:
+            nonlocal buf, pos, eof, base, line, col
+            if eof: return False
+            data = f.read(max(chunk_size, len(buf) - pos))
+            dropped = buf[:pos]
+            if '\n' in dropped: line, col = line + dropped.count('\n'), len(dropped) - dropped.rfind('\n')
+            else: col += len(dropped)
+            base += len(dropped)
+            buf, pos, eof = buf[pos:] + data, 0, not data
+            return bool(data)
+
+        def where(p: int) -> str:
+            n = buf.count('\n', 0, p)
+            column = p - buf.rfind('\n', 0, p) if n else col + p
+            return f"line {line + n} column {column} (char {base + p}) of '{json_path}'"
+
+        def peek() -> str:
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos] in ' \t\r\n': pos += 1
+                if pos < len(buf) or not more(): return buf[pos:pos + 1]
+
+        def value():
+            nonlocal pos
+            peek()
+            while True:
+                try:
+                    obj, end = decoder.raw_decode(buf, pos)
+                    if end < len(buf) or eof: pos = end; return obj
+                except json.JSONDecodeError as ex:
+                    if eof: raise ValueError(f"{ex.msg}: {where(ex.pos)}") from None
+                more()
+
+        def expect(c: str) -> None:
+            nonlocal pos
+            if peek() != c: raise ValueError(f"Invalid JSON: expected '{c}', found '{peek()}': {where(pos)}")
+            pos += 1
+
+        if peek() == '{':
+            expect('{')
+            while peek() == '"':
+                key = value(); expect(':')
+                if key == 'entries': break
+                value()
+                if peek() == ',': pos += 1
+            else: raise ValueError("The JSON file has no 'entries' list.")
+        expect('[')
+        if peek() == ']': return
+        while True:
+            yield value()
+            if peek() != ',': break
+            pos += 1
+        expect(']')
+
+def decode_entries(narc: NARC, pool=None):
+    """Decodes every entry in order (through `pool` if given), recording per-entry timings."""
+    timed = partial(timed_call, TxtCodec.get_strings)
+    for i, (seconds, texts) in enumerate(map_entries(timed, payloads(narc.entries, pool), pool)):
+        STATS.entry('decode', i, seconds, len(texts), len(narc.entries[i]))
+        yield texts
+
+def export_to_json(narc: NARC, json_path: str, pool=None, decoded=None):
+    if decoded is None: decoded = decode_entries(narc, pool)
+    write_json_entries(json_path, ({'entry_index': i, 'texts': [{'text_index': j, 'original_text': t, 'translated_text': t} for j, t in enumerate(texts)]} for i, texts in enumerate(decoded)))
     print(f"[SUCCESS] Export finished: {json_path}")
 
-def export_to_directory(narc: NARC, dir_path: str):
+def format_text_file(i: int, texts) -> bytes:
+    """Returns the whole NNNN.txt file of an entry as one buffer, with the platform's line endings."""
+    content = ''.join([f"# Entry {i:04d}\n\n", *(f"[{j:04d}]\n{text}\n\n" for j, text in enumerate(texts))])
+    if os.linesep != '\n': content = content.replace('\n', os.linesep)
+    return content.encode('utf-8', 'surrogatepass')
+
+def write_if_changed(path: Path, data: bytes) -> bool:
+    """Writes `data` in one call unless the file already holds exactly these bytes; returns whether it was written."""
+    try:
+        if path.stat().st_size == len(data) and path.read_bytes() == data: return False
+    except FileNotFoundError: pass
+    with open(path, 'wb') as f: f.write(data)
+    return True
+
+def write_text_directory(dir_path: str, entries, io_threads: int = 0) -> tuple[int, int]:
+    """Writes the texts of each entry to <dir_path>/0000/NNNN.txt, skipping empty entries and files whose content is
+    unchanged. With `io_threads`, entries are decoded and formatted while a bounded queue feeds a pool of writer
+    threads. Returns the number of files and how many of them were written."""
     p = Path(dir_path); p.mkdir(exist_ok=True)
     lang_dir = p / "0000"; lang_dir.mkdir(exist_ok=True)
-    count = 0
-    for i, entry_bytes in enumerate(narc.entries):
-        texts = TxtCodec.get_strings(entry_bytes)
-        if not texts: continue
-        with open(lang_dir / f"{i:04d}.txt", 'w', encoding='utf-8', errors='surrogatepass') as f:
-            f.write(f"# Entry {i:04d}\n\n")
-            for j, text in enumerate(texts): f.write(f"[{j:04d}]\n{text}\n\n")
-        count += 1
+    files = ((lang_dir / f"{i:04d}.txt", format_text_file(i, texts)) for i, texts in enumerate(entries) if texts)
+    if io_threads <= 1:
+        results = [write_if_changed(path, data) for path, data in files]
+        return len(results), sum(results)
+    jobs, results, errors = queue.Queue(maxsize=io_threads * 4), [], []
+
+    def writer():
+        while (job := jobs.get()) is not None:
+            if errors: continue
+            try: results.append(write_if_changed(*job))
+            except Exception as ex: errors.append(ex)
+
+    threads = [threading.Thread(target=writer, daemon=True) for _ in range(io_threads)]
+    for t in threads: t.start()
+    try:
+        for job in files:
+            if errors: break
+            jobs.put(job)
+    finally:
+        for _ in threads: jobs.put(None)
+        for t in threads: t.join()
+    if errors: raise errors[0]
+    return len(results), sum(results)
+
+def export_to_directory(narc: NARC, dir_path: str, pool=None, io_threads: int = 4, decoded=None):
+    if decoded is None: decoded = decode_entries(narc, pool)
+    count, written = write_text_directory(dir_path, decoded, io_threads)
+    if written < count: print(f"[INFO] {count - written} files were already up to date and left untouched.")
     print(f"[SUCCESS] {count} entries exported to the '{dir_path}' directory.")
 
-def load_translations(source_path: str, num_entries: int) -> list[list[str]]:
+TEXT_HEADER = re.compile(r'^\[(.*)\]$', re.M)
+TEXT_FILE = re.compile(r'^(\d{4,})\.txt$')
+
+def parse_text_file(content: str) -> list[str]:
+    """Single-pass tokenizer for an exported NNNN.txt file: [NNNN] headers, each followed by its text; '#' lines are comments."""
+    parts, texts = TEXT_HEADER.split(content), {}
+    for k in range(1, len(parts), 2):
+        try: idx = int(parts[k])
+        except ValueError: continue
+        if idx == -1: continue
+        body = parts[k + 1]
+        if '#' in body: body = '\n'.join(line for line in body.split('\n') if not line.startswith('#'))
+        texts[idx] = body.strip()
+    return [texts.get(j, "") for j in range(max(texts.keys()) + 1)] if texts else []
+
+class TextIndex:
+    """Sidecar index of a text directory: mtime, size, hash and parsed texts of every file, so unchanged files are skipped."""
+    NAME = '.index.json'
+    VERSION = 1
+
+    def __init__(self, lang_dir: Path):
+        self.path, self.files, self.dirty, self.skipped = lang_dir / self.NAME, {}, False, 0
+        try:
+            with open(self.path, encoding='utf-8', errors='surrogatepass') as f: data = json.load(f)
+            if data.get('version') == self.VERSION: self.files = data['files']
+        except (OSError, ValueError, KeyError): pass
+
+    def load(self, name: str, path: str, st: os.stat_result) -> list[str]:
+        rec = self.files.get(name)
+        if rec and rec['mtime_ns'] == st.st_mtime_ns and rec['size'] == st.st_size:
+            self.skipped += 1; return rec['texts']
+        with open(path, 'r', encoding='utf-8', errors='surrogatepass') as f: content = f.read()
+        digest = hashlib.blake2b(content.encode('utf-8', 'surrogatepass'), digest_size=16).hexdigest()
+        texts = rec['texts'] if rec and rec['hash'] == digest else parse_text_file(content)
+        self.files[name] = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'hash': digest, 'texts': texts}
+        self.dirty = True
+        return texts
+
+    def save(self) -> None:
+        if not self.dirty: return
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8', errors='surrogatepass') as f: json.dump({'version': self.VERSION, 'files': self.files}, f, ensure_ascii=False)
+        os.replace(tmp, self.path); self.dirty = False
+
+def read_text_file(path: str) -> list[str]:
+    with open(path, 'r', encoding='utf-8', errors='surrogatepass') as f: return parse_text_file(f.read())
+
+def scan_text_files(lang_dir: Path, num_entries: int) -> dict:
+    """Maps entry indices to the NNNN.txt files of a single directory scan."""
+    files = {}
+    with os.scandir(lang_dir) as it:
+        for de in it:
+            m = TEXT_FILE.match(de.name)
+            if m and de.name == f"{int(m.group(1)):04d}.txt" and int(m.group(1)) < num_entries and de.is_file(): files[int(m.group(1))] = de
+    return files
+
+def iter_directory_translations(lang_dir: Path, num_entries: int, io_threads: int = 0, index: Optional[TextIndex] = None):
+    """Yields the texts of NNNN.txt files found by a single directory scan, optionally read on a thread pool
+    and served from the sidecar `index` when unchanged."""
+    files = scan_text_files(lang_dir, num_entries)
+    load = (lambda de: index.load(de.name, de.path, de.stat())) if index else (lambda de: read_text_file(de.path))
+    with (ThreadPoolExecutor(io_threads) if io_threads > 1 else nullcontext()) as pool:
+        loaded = map_entries(load, (files[i] for i in sorted(files)), pool)
+        for i in range(num_entries):
+            yield next(loaded) if i in files else []
+    if index: index.save()
+
+def iter_translations(source_path: str, num_entries: int, io_threads: int = 0, index: Optional[TextIndex] = None):
+    """Yields the translated texts of each entry, reading the source one entry at a time."""
     p = Path(source_path)
     if p.is_dir():
         lang_dir = p / "0000"
         if not lang_dir.is_dir(): raise FileNotFoundError(f"The '{lang_dir}' directory was not found.")
-        all_translations = [[] for _ in range(num_entries)]
-        for i in range(num_entries):
-            fpath = lang_dir / f"{i:04d}.txt"
-            if not fpath.exists(): continue
-            with open(fpath, 'r', encoding='utf-8', errors='surrogatepass') as f: content = f.read()
-            texts = {}
-            current_idx, current_text = -1, ""
-            for line in content.splitlines():
-                if line.startswith('[') and line.endswith(']'):
-                    if current_idx != -1: texts[current_idx] = current_text.strip()
-                    try: current_idx = int(line[1:-1]); current_text = ""
-                    except ValueError: current_idx = -1
-                elif not line.startswith('#') and current_idx != -1: current_text += line + '\n'
-            if current_idx != -1: texts[current_idx] = current_text.strip()
-            if texts: all_translations[i] = [texts.get(j, "") for j in range(max(texts.keys()) + 1)]
-        return all_translations
+        yield from iter_directory_translations(lang_dir, num_entries, io_threads, index)
     elif p.is_file():
-        with open(p, encoding='utf-8', errors='surrogatepass') as f: data = json.load(f)
-        return [[t.get('translated_text') or '' for t in e.get('texts', [])] for e in (data['entries'] if isinstance(data, dict) else data)]
+        for e in iter_json_entries(source_path): yield [t.get('translated_text') or '' for t in e.get('texts', [])]
     else: raise FileNotFoundError("The specified input source does not exist.")
 
+def load_translations(source_path: str, num_entries: int) -> list[list[str]]:
+    return list(iter_translations(source_path, num_entries))
+
+class EntryCache:
+    """On-disk cache of encoded entries, keyed by a hash of their texts."""
+    VERSION = b'1'
+
+    def __init__(self, path: str):
+        self.path = Path(path); self.path.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+
+    @classmethod
+    def key(cls, texts: list[str]) -> str:
+        h = hashlib.blake2b(cls.VERSION, digest_size=16)
+        for t in texts:
+            b = t.encode('utf-8', 'surrogatepass'); h.update(struct.pack('<I', len(b))); h.update(b)
+        return h.hexdigest()
+
+    def get(self, texts: list[str]) -> Optional[bytes]:
+        try: data = (self.path / f"{self.key(texts)}.bin").read_bytes()
+        except FileNotFoundError: return None
+        self.hits += 1
+        return data
+
+    def put(self, texts: list[str], data: bytes) -> None:
+        fpath = self.path / f"{self.key(texts)}.bin"
+        tmp = fpath.with_name(f"{fpath.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(data); os.replace(tmp, fpath)
+
+def encode_changed(job: tuple[int, bytes, list[str], bool, bool]):
+    """Returns False if the texts match what the original entry decodes to, otherwise the encoded entry (None if `encode` is off).
+    Encoding errors of strict mode are raised with the index of the entry."""
+    i, original, texts, encode, strict = job
+    if texts == TxtCodec.get_strings(original): return False
+    try:
+        if strict and not encode:
+            for t in texts: EscapeCodec.encode(t, strict)
+        return TxtCodec.build_entry(texts, strict) if encode else None
+    except ValueError as ex: raise ValueError(f"Entry {i}: {ex}") from ex
+
+def build_entries(narc: NARC, translations, cache: Optional[EntryCache] = None, pool=None, strict: bool = False) -> tuple[list[bytes], list[int]]:
+    """Encodes the translated entries as they are read; entries whose texts match the original decode keep their
+    original bytes. Returns the new entry list and the indices of the entries that changed. With `strict`, malformed
+    escape sequences raise ValueError."""
+    new_entries, changed, pending, total = list(narc.entries), [], deque(), 0
+
+    def jobs():
+        nonlocal total
+        for i, texts in enumerate(translations):
+            total += 1
+            if i >= len(narc.entries) or not any(texts): continue
+            hit = cache.get(texts) if cache else None
+            pending.append((i, texts, hit))
+            yield i, (narc.entries[i] if pool is None else bytes(narc.entries[i])), texts, hit is None, strict
+
+    for seconds, result in map_entries(partial(timed_call, encode_changed), jobs(), pool):
+        i, texts, hit = pending.popleft()
+        STATS.entry('encode', i, seconds, len(texts), len(result) if result else 0)
+        if result is False: continue
+        if result is None: result = hit
+        elif cache: cache.put(texts, result)
+        new_entries[i] = result; changed.append(i)
+    if total != len(narc.entries): print(f"[WARNING] Mismatch in entry count: source ({total}) vs. NARC ({len(narc.entries)}).")
+    return new_entries, changed
+
+def open_archive(narc_path: str) -> NARC:
+    """Opens an archive lazily, recording the parse phase."""
+    with STATS.phase('parse') as rec:
+        narc = NARC.open(narc_path, lazy=True)
+        rec['bytes'] += os.path.getsize(narc_path); rec['entries'] += len(narc.entries)
+    return narc
+
+def export_archive(narc_path: str, output_json: Optional[str] = None, output_dir: Optional[str] = None, pool=None,
+                   index: Optional[str] = None, io_threads: int = 4) -> dict:
+    """Exports one archive to JSON and/or a directory and/or a search index; returns its summary record. The index is
+    filled from the decode pass of the first export instead of decoding the archive again."""
+    start = time.perf_counter()
+    with open_archive(narc_path) as narc, (SearchIndex(index) if index else nullcontext()) as db:
+        archive = db.begin(narc_path) if db else None
+        decoded = db.feed(archive, decode_entries(narc, pool)) if archive is not None else None
+        with STATS.phase('export'):
+            if output_json: export_to_json(narc, output_json, pool, decoded); decoded = None
+            if output_dir: export_to_directory(narc, output_dir, pool, io_threads, decoded); decoded = None
+        if decoded is not None:
+            with STATS.phase('index'): deque(decoded, maxlen=0)
+        if archive is not None: print(f"[INFO] {db.commit()} texts added to the search index '{index}'.")
+        elif db: print(f"[INFO] The search index '{index}' is already up to date for {narc_path}.")
+        return {'entries': len(narc.entries), 'seconds': round(time.perf_counter() - start, 3)}
+
+def import_archive(source: str, narc_original: str, narc_output: str, cache_dir: Optional[str] = None, pool=None,
+                   io_threads: int = 0, use_index: bool = False, strict: bool = False) -> dict:
+    """Imports translations into one archive and writes the result; returns its summary record."""
+    start = time.perf_counter()
+    with open_archive(narc_original) as narc:
+        cache = EntryCache(cache_dir) if cache_dir else None
+        index = TextIndex(Path(source) / "0000") if use_index and os.path.isdir(source) else None
+        if os.path.isfile(source): STATS.record('load')['bytes'] += os.path.getsize(source)
+        with STATS.phase('import'):
+            new_entries, changed = build_entries(narc, STATS.timed_iter('load', iter_translations(source, len(narc.entries), io_threads, index)), cache, pool, strict)
+        size = narc.write(narc_output, new_entries)
+        return {'entries': len(narc.entries), 'updated': len(changed), 'cached': cache.hits if cache else 0,
+                'unchanged': index.skipped if index else 0, 'bytes': size, 'seconds': round(time.perf_counter() - start, 3)}
+
+def patch_archive(source: str, narc_path: str, output: Optional[str] = None, cache_dir: Optional[str] = None, pool=None,
+                  strict: bool = False) -> dict:
+    """Imports translations by patching the archive in place (or a filesystem copy of it, if `output` is given),
+    rewriting only the data from the first changed entry onward."""
+    start = time.perf_counter()
+    if output and not (os.path.exists(output) and os.path.samefile(output, narc_path)): copy_file(narc_path, output)
+    target = output or narc_path
+    with open_archive(target) as narc:
+        cache = EntryCache(cache_dir) if cache_dir else None
+        with STATS.phase('import'):
+            new_entries, changed = build_entries(narc, STATS.timed_iter('load', iter_translations(source, len(narc.entries))), cache, pool, strict)
+        written = narc.patch(target, new_entries, changed[0]) if changed else 0
+        return {'entries': len(new_entries), 'updated': len(changed), 'first': changed[0] if changed else None,
+                'written': written, 'seconds': round(time.perf_counter() - start, 3)}
+
+# ---------- Archive Diff ---------- #
+
+def entry_hash(data) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+def diff_archives(old_path: str, new_path: str) -> dict:
+    """Compares two archives entry by entry: raw entry bytes are hashed straight from the mapped files and only the
+    entries whose hashes differ are decoded. Returns the per-text changes and a summary."""
+    changes, differing = [], 0
+    with open_archive(old_path) as old, open_archive(new_path) as new:
+        count = max(len(old.entries), len(new.entries))
+        for i in range(count):
+            a = old.entries[i] if i < len(old.entries) else None
+            b = new.entries[i] if i < len(new.entries) else None
+            if a is not None and b is not None:
+                with STATS.phase('hash') as rec:
+                    rec['bytes'] += len(a) + len(b); rec['entries'] += 1
+                    if len(a) == len(b) and entry_hash(a) == entry_hash(b): continue
+            differing += 1
+            with STATS.phase('decode') as rec:
+                before = TxtCodec.get_strings(a) if a is not None else []
+                after = TxtCodec.get_strings(b) if b is not None else []
+                rec['entries'] += 1; rec['strings'] += len(before) + len(after)
+            for j in range(max(len(before), len(after))):
+                if j >= len(before): changes.append({'entry_index': i, 'text_index': j, 'status': 'added', 'new': after[j]})
+                elif j >= len(after): changes.append({'entry_index': i, 'text_index': j, 'status': 'removed', 'old': before[j]})
+                elif before[j] != after[j]: changes.append({'entry_index': i, 'text_index': j, 'status': 'changed', 'old': before[j], 'new': after[j]})
+        summary = {'entries': count, 'differing_entries': differing,
+                   **{k: sum(c['status'] == k for c in changes) for k in ('added', 'removed', 'changed')}}
+    return {'old': old_path, 'new': new_path, 'summary': summary, 'changes': changes}
+
+# ---------- Search Index ---------- #
+
+CONTROL_CODE = re.compile(r'\\xf000.\\x([0-9a-fA-F]{4})', re.S)
+CONTROL_PARAM = re.compile(r'\\x[0-9a-fA-F]{4}|.', re.S)
+TOKEN = re.compile(r'\w+')
+
+def file_hash(path: str) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(partial(f.read, 1 << 20), b''): h.update(chunk)
+    return h.hexdigest()
+
+def control_codes(text: str) -> list[tuple[int, int]]:
+    """Returns the (start, end) spans of the control codes of an exported text: command, parameter count and parameters."""
+    spans, pos = [], 0
+    while (m := CONTROL_CODE.search(text, pos)):
+        pos = m.end()
+        for _ in range(int(m.group(1), 16)):
+            if not (param := CONTROL_PARAM.match(text, pos)): break
+            pos = param.end()
+        spans.append((m.start(), pos))
+    return spans
+
+def plain_text(text: str) -> str:
+    """Returns an exported text without its control codes and escapes."""
+    out, pos = [], 0
+    for start, end in control_codes(text):
+        out.append(text[pos:start]); out.append(' '); pos = end
+    out.append(text[pos:])
+    return EscapeCodec.ESCAPE.sub(' ', ''.join(out))
+
+def tokenize(text: str) -> set[str]:
+    return set(TOKEN.findall(plain_text(text).casefold()))
+
+class SearchIndex:
+    """SQLite inverted index of decoded texts: token -> (archive, entry, text index). Archives are re-indexed
+    only when their content hash changes, and queries never decode anything."""
+    VERSION = 1
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS archives (id INTEGER PRIMARY KEY, path TEXT UNIQUE, hash TEXT, mtime_ns INTEGER, size INTEGER);
+        CREATE TABLE IF NOT EXISTS texts (archive INTEGER, entry INTEGER, text_index INTEGER, text TEXT,
+                                          PRIMARY KEY (archive, entry, text_index)) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS postings (token TEXT, archive INTEGER, entry INTEGER, text_index INTEGER,
+                                             PRIMARY KEY (token, archive, entry, text_index)) WITHOUT ROWID;
+    """
+
+    def __init__(self, path: str):
+        self.db, self.count = sqlite3.connect(path, timeout=60), 0
+        if self.db.execute("PRAGMA user_version").fetchone()[0] not in (0, self.VERSION):
+            self.db.close(); raise ValueError(f"'{path}' is not a search index of this version.")
+        with self.db:
+            self.db.executescript(self.SCHEMA); self.db.execute(f"PRAGMA user_version = {self.VERSION}")
+
+    def close(self) -> None:
+        self.db.close()
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()
+
+    def begin(self, narc_path: str) -> Optional[int]:
+        """Starts (re)indexing an archive and clears its old texts; returns its id, or None if its hash is unchanged.
+        Nothing is committed until `commit`, so an export that fails leaves the index as it was."""
+        path, st = str(Path(narc_path).resolve()), os.stat(narc_path)
+        digest = file_hash(narc_path)
+        row = self.db.execute("SELECT id, hash FROM archives WHERE path = ?", (path,)).fetchone()
+        if row and row[1] == digest:
+            with self.db: self.db.execute("UPDATE archives SET mtime_ns = ?, size = ? WHERE id = ?", (st.st_mtime_ns, st.st_size, row[0]))
+            return None
+        self.count = 0
+        if not row: return self.db.execute("INSERT INTO archives (path, hash, mtime_ns, size) VALUES (?, ?, ?, ?)", (path, digest, st.st_mtime_ns, st.st_size)).lastrowid
+        self.db.execute("DELETE FROM texts WHERE archive = ?", (row[0],)); self.db.execute("DELETE FROM postings WHERE archive = ?", (row[0],))
+        self.db.execute("UPDATE archives SET hash = ?, mtime_ns = ?, size = ? WHERE id = ?", (digest, st.st_mtime_ns, st.st_size, row[0]))
+        return row[0]
+
+    def feed(self, archive: int, decoded):
+        """Adds each decoded entry to the index as it passes through, so the index is built from the export's decode pass."""
+        for i, texts in enumerate(decoded):
+            self.db.executemany("INSERT INTO texts VALUES (?, ?, ?, ?)", ((archive, i, j, t) for j, t in enumerate(texts)))
+            self.db.executemany("INSERT INTO postings VALUES (?, ?, ?, ?)", ((tok, archive, i, j) for j, t in enumerate(texts) for tok in tokenize(t)))
+            self.count += len(texts)
+            yield texts
+
+    def commit(self) -> int:
+        """Commits the texts fed since `begin`; returns their number."""
+        self.db.commit()
+        return self.count
+
+    def stale(self) -> list[str]:
+        """Returns the indexed archives that were changed or removed since they were indexed (hashing only files whose mtime or size changed)."""
+        out = []
+        for archive, path, digest, mtime_ns, size in self.db.execute("SELECT id, path, hash, mtime_ns, size FROM archives").fetchall():
+            try: st = os.stat(path)
+            except OSError: out.append(path); continue
+            if (st.st_mtime_ns, st.st_size) == (mtime_ns, size): continue
+            if file_hash(path) != digest: out.append(path); continue
+            with self.db: self.db.execute("UPDATE archives SET mtime_ns = ?, size = ? WHERE id = ?", (st.st_mtime_ns, st.st_size, archive))
+        return out
+
+    def search(self, query: str, limit: int = 50) -> list[tuple[str, int, int, str]]:
+        """Returns the (archive, entry, text index, text) of texts containing every word of the query."""
+        tokens = sorted(tokenize(query))
+        if not tokens: raise ValueError("The query does not contain any words.")
+        match = " INTERSECT ".join(["SELECT archive, entry, text_index FROM postings WHERE token = ?"] * len(tokens))
+        return self.db.execute(f"SELECT a.path, t.entry, t.text_index, t.text FROM ({match}) m JOIN texts t USING (archive, entry, text_index) "
+                               f"JOIN archives a ON a.id = t.archive ORDER BY a.path, t.entry, t.text_index LIMIT ?", (*tokens, limit)).fetchall()
+
+# ---------- Translation Memory ---------- #
+
+PLACEHOLDER = '\ue000'
+
+def split_codes(text: str) -> tuple[str, list[str]]:
+    """Splits a text into its skeleton (control codes replaced by a placeholder) and the list of its control codes."""
+    out, codes, pos = [], [], 0
+    for start, end in control_codes(text):
+        out.append(text[pos:start]); out.append(PLACEHOLDER); codes.append(text[start:end]); pos = end
+    out.append(text[pos:])
+    return ''.join(out), codes
+
+def map_codes(translated: str, source: list[str], target: list[str]) -> Optional[str]:
+    """Replaces the control codes of a translation (taken from `source`) with the ones at the same positions in `target`;
+    returns None if they cannot be matched up."""
+    if source == target: return translated
+    if len(source) != len(target): return None
+    out, pos, used = [], 0, set()
+    for start, end in control_codes(translated):
+        code = translated[start:end]
+        k = next((k for k, c in enumerate(source) if c == code and k not in used), None)
+        if k is None: return None
+        used.add(k); out.append(translated[pos:start]); out.append(target[k]); pos = end
+    out.append(translated[pos:])
+    return ''.join(out)
+
+class TranslationMemory:
+    """Original -> translated text pairs, matched exactly on their skeleton or approximately by the Jaccard similarity of
+    character trigrams. Only the rarest trigrams of each text are indexed and probed (prefix filtering), so lookups
+    never compare against the whole memory."""
+    N = 3
+
+    def __init__(self, threshold: float = 0.8):
+        self.threshold, self.exact, self.records, self.postings, self.order = threshold, {}, [], None, None
+
+    @classmethod
+    def shingles(cls, skeleton: str) -> frozenset:
+        s = ' '.join(skeleton.casefold().split())
+        return frozenset(s[i:i + cls.N] for i in range(max(len(s) - cls.N + 1, 1)))
+
+    def add(self, original: str, translated: str) -> None:
+        skeleton, codes = split_codes(original)
+        if skeleton in self.exact: return
+        self.exact[skeleton] = (translated, codes)
+        self.records.append((self.shingles(skeleton), translated, codes)); self.postings = None
+
+    def prefix(self, grams: frozenset) -> list[str]:
+        """Returns the rarest trigrams of a set, as many as a text at the threshold similarity must share with it.
+        Trigrams that no record contains come first."""
+        rank = self.order.get
+        return sorted(grams, key=lambda g: rank(g, -1))[:len(grams) - math.ceil(self.threshold * len(grams)) + 1]
+
+    def build(self) -> None:
+        """Indexes the prefix of every record, ranking trigrams by how many records contain them. Each posting list
+        is sorted by trigram count, so records of incompatible length are skipped by bisection."""
+        counts, postings = defaultdict(int), defaultdict(list)
+        for grams, _, _ in self.records:
+            for g in grams: counts[g] += 1
+        self.order = {g: k for k, g in enumerate(sorted(counts, key=lambda g: (counts[g], g)))}
+        for rid, (grams, _, _) in enumerate(self.records):
+            for g in self.prefix(grams): postings[g].append((len(grams), rid))
+        self.postings = {}
+        for g, items in postings.items():
+            items.sort(); self.postings[g] = ([n for n, _ in items], [rid for _, rid in items])
+
+    def load(self, json_path: str) -> int:
+        """Adds every translated text of an exported JSON file; returns the number of pairs added."""
+        count = len(self.exact)
+        for e in iter_json_entries(json_path):
+            for t in e.get('texts', []):
+                original, translated = t.get('original_text') or '', t.get('translated_text') or ''
+                if original and translated and translated != original: self.add(original, translated)
+        return len(self.exact) - count
+
+    def match(self, original: str) -> Optional[tuple[str, float]]:
+        """Returns the translation of the best match (with the control codes of `original`) and its similarity, if any."""
+        skeleton, codes = split_codes(original)
+        if skeleton in self.exact:
+            translated = map_codes(*self.exact[skeleton], codes)
+            if translated is not None: return translated, 1.0
+        if self.postings is None: self.build()
+        grams = self.shingles(skeleton)
+        t, size = self.threshold, len(grams)
+        best, best_score, candidates = None, t, set()
+        for g in self.prefix(grams):
+            if g not in self.postings: continue
+            sizes, rids = self.postings[g]
+            candidates.update(rids[bisect_left(sizes, t * size):bisect_right(sizes, size / t)])
+        for rid in sorted(candidates):
+            other, translated, source = self.records[rid]
+            common = len(grams & other)
+            score = common / (size + len(other) - common)
+            if score > best_score or best is None and score >= best_score:
+                mapped = map_codes(translated, source, codes)
+                if mapped is not None: best, best_score = (rid, mapped), score
+        return (best[1], best_score) if best else None
+
+def prefill_json(input_json: str, memory: TranslationMemory, output_json: str) -> dict:
+    """Fills the untranslated texts of an exported JSON file from the translation memory; similar (not exact) matches
+    get a 'similarity' field so they can be reviewed."""
+    counts = {'exact': 0, 'similar': 0, 'untranslated': 0}
+
+    def entries():
+        for e in iter_json_entries(input_json):
+            for t in e.get('texts', []):
+                original = t.get('original_text') or ''
+                if not original or (t.get('translated_text') or original) != original: continue
+                found = memory.match(original)
+                if not found: counts['untranslated'] += 1; continue
+                t['translated_text'], score = found
+                if score < 1.0: t['similarity'] = round(score, 3); counts['similar'] += 1
+                else: counts['exact'] += 1
+            yield e
+    write_json_entries(output_json, entries())
+    return counts
+
+# ---------- Watch Mode ---------- #
+
+class WatchSession:
+    """Keeps the original archive and its decoded texts in memory and rebuilds the output whenever the translations change."""
+
+    def __init__(self, source: str, narc_path: str, output: str):
+        if os.path.exists(output) and os.path.samefile(output, narc_path): raise ValueError("The output must not overwrite the original NARC file.")
+        self.source, self.output, self.is_dir = source, output, os.path.isdir(source)
+        self.lang_dir = Path(source) / "0000"
+        if self.is_dir and not self.lang_dir.is_dir(): raise FileNotFoundError(f"The '{self.lang_dir}' directory was not found.")
+        with open_archive(narc_path) as narc:
+            self.original = [bytes(e) for e in narc.entries]
+        self.narc = NARC()
+        with STATS.phase('decode'): self.strings = [TxtCodec.get_strings(e) for e in self.original]
+        self.entries, self.texts, self.stamps = list(self.original), [[] for _ in self.original], None
+
+    def stamp(self) -> dict:
+        """Returns the (mtime, size) of every watched file, keyed by entry index (-1 for a JSON source)."""
+        if not self.is_dir:
+            st = os.stat(self.source); return {-1: (st.st_mtime_ns, st.st_size)}
+        return {i: (st.st_mtime_ns, st.st_size) for i, st in ((i, de.stat()) for i, de in scan_text_files(self.lang_dir, len(self.original)).items())}
+
+    def read(self, stamps: dict) -> dict:
+        """Reads the texts of the files whose stamp changed since the last poll; removed files, and entries missing from
+        the end of a JSON source, fall back to the original."""
+        if not self.is_dir:
+            texts = list(iter_translations(self.source, len(self.original)))
+            return dict(enumerate(texts + [[] for _ in range(len(self.original) - len(texts))]))
+        old = self.stamps or {}
+        changed = {i for i in stamps.keys() | old.keys() if stamps.get(i) != old.get(i)}
+        return {i: read_text_file(str(self.lang_dir / f"{i:04d}.txt")) if i in stamps else [] for i in changed}
+
+    def poll(self) -> Optional[list[int]]:
+        """Re-encodes the entries whose texts changed and rewrites the output (always on the first poll);
+        returns their indices (None if the output was left as it was)."""
+        stamps, first = self.stamp(), self.stamps is None
+        if stamps == self.stamps: return None
+        updated = []
+        for i, texts in self.read(stamps).items():
+            if i >= len(self.original) or texts == self.texts[i]: continue
+            self.texts[i] = texts
+            entry = self.original[i] if not any(texts) or texts == self.strings[i] else TxtCodec.build_entry(texts)
+            if entry is not self.entries[i]: self.entries[i] = entry; updated.append(i)
+        self.stamps = stamps
+        if not updated and not first: return None
+        self.narc.write(self.output, self.entries)
+        return sorted(updated)
+
+    def run(self, interval: float) -> None:
+        """Polls the source every `interval` seconds until interrupted."""
+        print(f"[INFO] Watching '{self.source}' (Ctrl+C to stop).")
+        while True:
+            start = time.perf_counter()
+            try: updated = self.poll()
+            except (OSError, ValueError) as ex: print(f"[WARNING] Could not read the translations, retrying: {ex}")
+            else:
+                if updated is not None: print(f"[INFO] {len(updated)} entries re-encoded in {(time.perf_counter() - start) * 1000:.1f} ms: {self.output}")
+            time.sleep(interval)
+
+# ---------- Server Mode ---------- #
+
+class Workspace:
+    """Archives loaded once for a long-running server: recently decoded entries and pending edits stay in memory between requests."""
+
+    def __init__(self, narc_paths: list[str]):
+        self.archives, self.lock = {}, threading.Lock()
+        for path in narc_paths:
+            name = Path(path).stem
+            if name in self.archives: raise ValueError(f"Two archives are named '{name}'.")
+            narc = open_archive(path)
+            self.archives[name] = {'path': path, 'narc': narc, 'edits': {}}
+
+    def close(self) -> None:
+        for a in self.archives.values(): a['narc'].close()
+
+    def archive(self, req: dict) -> dict:
+        name = req.get('archive')
+        if name is None and len(self.archives) == 1: name = next(iter(self.archives))
+        if name not in self.archives: raise ValueError(f"Unknown archive: {name}")
+        return self.archives[name]
+
+    @staticmethod
+    def strings(a: dict, i: int) -> list[str]:
+        """Returns the original texts of entry `i` from the archive's bounded cache of decoded entries."""
+        n = len(a['narc'].entries)
+        if not 0 <= i < n: raise IndexError(f"Entry {i} is out of range (0-{n - 1}).")
+        return a['narc'].strings(i)
+
+    @staticmethod
+    def integer(req: dict, field: str) -> int:
+        """Returns an integer field of a request, rejecting floats, booleans and strings."""
+        v = req[field]
+        if not isinstance(v, int) or isinstance(v, bool): raise ValueError(f"The '{field}' field must be an integer.")
+        return v
+
+    def texts(self, a: dict, i: int) -> list[str]:
+        """Returns the current (edited or original) texts of entry `i`."""
+        return a['edits'][i][0] if i in a['edits'] else self.strings(a, i)
+
+    def entries(self, a: dict) -> list[bytes]:
+        """Returns the entry list with the edits applied, encoding each edit once."""
+        entries = list(a['narc'].entries)
+        for i, (texts, data) in a['edits'].items():
+            if data is None: data = a['edits'][i][1] = TxtCodec.build_entry(texts)
+            entries[i] = data
+        return entries
+
+    def handle(self, req: dict) -> dict:
+        """Runs one request ({'op': 'list' | 'get' | 'set' | 'rebuild' | 'export', ...}) and returns the response."""
+        op = req.get('op')
+        with self.lock:
+            if op == 'list':
+                return {'archives': [{'archive': k, 'path': a['path'], 'entries': len(a['narc'].entries), 'edited': sorted(a['edits'])} for k, a in self.archives.items()]}
+            a = self.archive(req)
+            if op == 'get':
+                return {'texts': list(self.texts(a, self.integer(req, 'entry')))}
+            if op == 'set':
+                i = self.integer(req, 'entry'); texts = list(self.texts(a, i))
+                if 'texts' in req:
+                    if not isinstance(req['texts'], list) or not all(isinstance(t, str) for t in req['texts']): raise ValueError("The 'texts' field must be a list of strings.")
+                    texts = list(req['texts'])
+                else:
+                    j = self.integer(req, 'text_index')
+                    if not 0 <= j < len(texts): raise IndexError(f"Text {j} is out of range (0-{len(texts) - 1}).")
+                    if not isinstance(req['text'], str): raise ValueError("The 'text' field must be a string.")
+                    texts[j] = req['text']
+                if texts == self.strings(a, i): a['edits'].pop(i, None)
+                else: a['edits'][i] = [texts, None]
+                return {'texts': texts}
+            if op == 'rebuild':
+                if not req.get('output'): raise ValueError("The 'output' field is required.")
+                if os.path.exists(req['output']) and os.path.samefile(req['output'], a['path']): raise ValueError("The output must not overwrite the original NARC file.")
+                return {'output': req['output'], 'updated': len(a['edits']), 'bytes': a['narc'].write(req['output'], self.entries(a))}
+            if op == 'export':
+                if not req.get('output_json') and not req.get('output_dir'): raise ValueError("At least one output must be specified (output_json or output_dir).")
+                n = len(a['narc'].entries)
+                if req.get('output_json'):
+                    write_json_entries(req['output_json'], ({'entry_index': i, 'texts': [{'text_index': j, 'original_text': o, 'translated_text': t} for j, (o, t) in enumerate(zip_longest(self.strings(a, i), self.texts(a, i), fillvalue=''))]} for i in range(n)))
+                if req.get('output_dir'): write_text_directory(req['output_dir'], (self.texts(a, i) for i in range(n)))
+                return {'entries': n}
+            raise ValueError(f"Unknown operation: {op}")
+
+    def respond(self, body: bytes) -> tuple[int, bytes]:
+        """Decodes a JSON request and encodes the response, turning errors into {'ok': false, 'error': ...}."""
+        try:
+            req = json.loads(body)
+            if not isinstance(req, dict): raise ValueError("The request must be a JSON object.")
+            status, res = 200, {'ok': True, **self.handle(req)}
+        except (KeyError, IndexError, ValueError, TypeError, OSError) as ex:
+            status, res = 400, {'ok': False, 'error': f"Missing field: {ex}" if isinstance(ex, KeyError) else str(ex)}
+        return status, json.dumps(res).encode('ascii')
+
+class HTTPHandler(BaseHTTPRequestHandler):
+    """POST / with a JSON request body; the response is a JSON object. Only application/json requests addressed to
+    localhost are served, so web pages open in a browser cannot reach the server (they would need a CORS preflight)."""
+    workspace: Workspace = None
+    LOCAL_HOSTS = ('localhost', '127.0.0.1')
+
+    def rejection(self) -> Optional[tuple[int, str]]:
+        """Returns the status and error of a request that must not be served, or None."""
+        if (self.headers.get('Content-Type') or '').split(';')[0].strip().lower() != 'application/json':
+            return 415, "The request must have the Content-Type application/json."
+        origin = self.headers.get('Origin')
+        if urlsplit('//' + (self.headers.get('Host') or '')).hostname not in self.LOCAL_HOSTS or (origin is not None and urlsplit(origin).hostname not in self.LOCAL_HOSTS):
+            return 403, "Only requests from localhost are accepted."
+        length = self.headers.get('Content-Length')
+        if length is None: return 411, "The request must have a Content-Length header."
+        if not length.strip().isdecimal(): return 400, "The Content-Length header is invalid."
+        return None
+
+    def do_POST(self):
+        rejected = self.rejection()
+        if rejected: status, data = rejected[0], json.dumps({'ok': False, 'error': rejected[1]}).encode('ascii')
+        else: status, data = self.workspace.respond(self.rfile.read(int(self.headers['Content-Length'])))
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json'); self.send_header('Content-Length', str(len(data)))
+        self.end_headers(); self.wfile.write(data)
+
+    def log_message(self, format, *args): pass
+
+class SocketHandler(socketserver.StreamRequestHandler):
+    """One JSON request per line; each is answered with one JSON line."""
+    workspace: Workspace = None
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip(): continue
+            self.wfile.write(self.workspace.respond(line)[1] + b'\n'); self.wfile.flush()
+
+def serve(workspace: Workspace, port: int = 8765, socket_path: Optional[str] = None) -> None:
+    """Serves the workspace on a Unix socket or on HTTP at localhost until interrupted."""
+    if socket_path:
+        if not hasattr(socket, 'AF_UNIX'): raise ValueError("Unix sockets are not supported on this system.")
+        if os.path.lexists(socket_path):
+            if not stat.S_ISSOCK(os.lstat(socket_path).st_mode): raise ValueError(f"'{socket_path}' already exists and is not a socket.")
+            os.unlink(socket_path)
+        server = socketserver.ThreadingUnixStreamServer(socket_path, type('Handler', (SocketHandler,), {'workspace': workspace}))
+        where = socket_path
+    else:
+        server = ThreadingHTTPServer(('127.0.0.1', port), type('Handler', (HTTPHandler,), {'workspace': workspace}))
+        where = f"http://127.0.0.1:{server.server_address[1]}/"
+    server.daemon_threads = True
+    print(f"[INFO] Serving {len(workspace.archives)} archive(s) on {where} (Ctrl+C to stop).", flush=True)
+    try: server.serve_forever()
+    finally:
+        server.server_close()
+        if socket_path and os.path.lexists(socket_path) and stat.S_ISSOCK(os.lstat(socket_path).st_mode): os.unlink(socket_path)
+
+# ---------- Batch Processing ---------- #
+
+def find_archives(source: str) -> list[tuple[Path, str]]:
+    """Lists the NARCs of a directory (recursively) or of a manifest file (one path per line, '#' comments),
+    together with the name (path relative to their common directory, without suffix) used for their outputs."""
+    p = Path(source)
+    if p.is_dir():
+        return [(f, f.relative_to(p).with_suffix('').as_posix()) for f in sorted(p.rglob('*')) if f.is_file() and f.suffix.lower() == '.narc']
+    if not p.is_file(): raise FileNotFoundError("The specified input source does not exist.")
+    files = [p.parent / line.strip() for line in p.read_text(encoding='utf-8').splitlines() if line.strip() and not line.lstrip().startswith('#')]
+    if not files: return []
+    base = Path(os.path.commonpath([f.resolve().parent for f in files]))
+    return [(f, f.resolve().relative_to(base).with_suffix('').as_posix()) for f in files]
+
+def batch_task(task: tuple) -> dict:
+    """Runs one archive of a batch, turning failures into an error record."""
+    fn, args = task
+    try: return {'status': 'ok', **fn(*args)}
+    except Exception as ex: return {'status': 'error', 'error': str(ex)}
+
+def run_batch(command: str, tasks: list[tuple], output_dir: str, jobs: int) -> int:
+    """Runs (record, fn, args) tasks on one shared worker pool and writes summary.json; returns the number of failures."""
+    records = []
+    with worker_pool(jobs) as pool:
+        pending = [pool.submit(batch_task, (fn, args)) if pool else (fn, args) for _, fn, args in tasks]
+        for (record, _, _), job in zip(tasks, pending):
+            result = job.result() if pool else batch_task(job)
+            records.append({**record, **result})
+            if result['status'] == 'ok': print(f"[INFO] {record['narc']}: {result['entries']} entries processed in {result['seconds']} s.")
+            else: print(f"[ERROR] {record['narc']}: {result['error']}", file=sys.stderr)
+    failed = sum(r['status'] != 'ok' for r in records)
+    summary = Path(output_dir) / 'summary.json'
+    with open(summary, 'w', encoding='utf-8') as f:
+        json.dump({'command': command, 'archives': records, 'failed': failed}, f, ensure_ascii=False, indent=2)
+    print(f"[SUCCESS] {len(records) - failed} of {len(records)} archives processed. Summary: {summary}")
+    return failed
+
+# ---------- Benchmarks ---------- #
+
+BENCH_SHAPES = {
+    'small':   {'entries': 200, 'strings': 20, 'length': 40, 'control': 0.05},
+    'wide':    {'entries': 20, 'strings': 400, 'length': 40, 'control': 0.05},
+    'long':    {'entries': 50, 'strings': 8, 'length': 1000, 'control': 0.02},
+    'control': {'entries': 200, 'strings': 20, 'length': 40, 'control': 0.5},
+}
+BENCH_CONTROLS = ['\\xfffe', '\\xf000', '\\x0000', '\\x0001', '\\xfffe', '\\x0000']
+
+def synthetic_texts(rng, strings: int, length: int, control: float) -> list[str]:
+    """Random texts of about `length` code units; a `control` share of them are \\xNNNN control codes."""
+    letters = 'abcdefghijklmnopqrstuvwxyz ABCDEFGHIJKLMNOPQRSTUVWXYZ.,!?éáő'
+    return [''.join(rng.choice(BENCH_CONTROLS) if rng.random() < control else rng.choice(letters) for _ in range(rng.randint(length // 2, length * 3 // 2))) for _ in range(strings)]
+
+def synthetic_narc(fn: str, entries: int, strings: int, length: int, control: float, seed: int = 0) -> list[list[str]]:
+    """Writes a synthetic NARC built with TxtCodec.build_entry and NARC.write; returns its texts."""
+    rng = Random(seed)
+    texts = [synthetic_texts(rng, strings, length, control) for _ in range(entries)]
+    NARC().write(fn, [TxtCodec.build_entry(t) for t in texts])
+    return texts
+
+def bench_shape(shape: dict, repeat: int) -> dict:
+    """Times every phase on one synthetic archive: best wall time, throughput and peak traced memory."""
+    with tempfile.TemporaryDirectory() as tmp:
+        src, blank, out = (os.path.join(tmp, n) for n in ('bench.narc', 'blank.narc', 'out.narc'))
+        texts = synthetic_narc(src, **shape)
+        NARC().write(blank, [b''] * len(texts))
+        size, count = os.path.getsize(src), sum(len(t) for t in texts)
+        narc = NARC.open(src)
+        encoded = list(narc.entries)
+        phases = {
+            'open': lambda: NARC.open(src),
+            'get_strings': lambda: [TxtCodec.get_strings(e) for e in encoded],
+            'build_entry': lambda: [TxtCodec.build_entry(t) for t in texts],
+            'rebuild': lambda: narc.rebuild(encoded),
+            'write': lambda: narc.write(out, encoded),
+            'export_json': lambda: export_to_json(narc, os.path.join(tmp, 'texts.json')),
+            'import_json': lambda: import_archive(os.path.join(tmp, 'texts.json'), blank, out),
+            'export_dir': lambda: (shutil.rmtree(os.path.join(tmp, 'texts'), ignore_errors=True), export_to_directory(narc, os.path.join(tmp, 'texts'))),
+            'reexport_dir': lambda: export_to_directory(narc, os.path.join(tmp, 'texts')),
+            'import_dir': lambda: import_archive(os.path.join(tmp, 'texts'), blank, out),
+        }
+        results = {}
+        with redirect_stdout(io.StringIO()):
+            for name, fn in phases.items():
+                best = float('inf')
+                for _ in range(repeat):
+                    start = time.perf_counter(); fn(); best = min(best, time.perf_counter() - start)
+                tracemalloc.start()
+                fn()
+                peak = tracemalloc.get_traced_memory()[1]; tracemalloc.stop()
+                results[name] = {'seconds': round(best, 6), 'strings_per_s': round(count / best), 'mb_per_s': round(size / best / 1e6, 2), 'peak_kb': peak // 1024}
+        return {'shape': shape, 'bytes': size, 'strings': count, 'phases': results}
+
+def bench_corpus(json_path: str, repeat: int) -> dict:
+    """Times the escape engine against the reference parser and decoder on the texts of an exported JSON file,
+    after checking that both give the same results."""
+    texts = [t.get('original_text') or '' for e in iter_json_entries(json_path) for t in e.get('texts', [])]
+    codes = [TxtCodec.txt_to_codes(t) for t in texts]
+    units = [array('H', c) for c in codes]
+    if [list(EscapeCodec.encode(t)) for t in texts] != codes or [EscapeCodec.decode(u) for u in units] != [TxtCodec.codes_to_txt(u) for u in units]:
+        raise ValueError("The escape engine does not match the reference functions on this corpus.")
+    phases = {
+        'encode_reference': lambda: [TxtCodec.txt_to_codes(t) for t in texts],
+        'encode': lambda: [EscapeCodec.encode(t) for t in texts],
+        'encode_strict': lambda: [EscapeCodec.encode(t, True) for t in texts],
+        'decode_reference': lambda: [TxtCodec.codes_to_txt(u) for u in units],
+        'decode': lambda: [EscapeCodec.decode(u) for u in units],
+    }
+    results, size = {}, sum(len(u) for u in units) * 2
+    for name, fn in phases.items():
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter(); fn(); best = min(best, time.perf_counter() - start)
+        results[name] = {'seconds': round(best, 6), 'strings_per_s': round(len(texts) / best), 'mb_per_s': round(size / best / 1e6, 2)}
+    return {'corpus': json_path, 'strings': len(texts), 'bytes': size, 'phases': results}
+
+def compare_bench(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Lists the phases (of the shapes and of the corpus run) that got slower than the baseline by more than `threshold` (a fraction)."""
+    runs = []
+    for shape, res in results['shapes'].items():
+        old = baseline.get('shapes', {}).get(shape)
+        if old and old.get('shape') == res['shape']: runs.append((shape, res, old))
+    res, old = results.get('corpus'), baseline.get('corpus')
+    if res and old and (old.get('strings'), old.get('bytes')) == (res['strings'], res['bytes']): runs.append(('corpus', res, old))
+    regressions = []
+    for name, res, old in runs:
+        for phase, m in res['phases'].items():
+            was = old['phases'].get(phase, {}).get('seconds')
+            if was and m['seconds'] > was * (1 + threshold): regressions.append(f"{name}/{phase}: {was:.4f} s -> {m['seconds']:.4f} s (+{(m['seconds'] / was - 1) * 100:.0f}%)")
+    return regressions
+
+def run_bench(shapes: dict, repeat: int, output: Optional[str], baseline: Optional[str], threshold: float, corpus: Optional[str] = None) -> int:
+    """Runs the benchmark suite, prints a table, saves the results and compares them to a baseline; returns the number of regressions."""
+    results = {'python': sys.version.split()[0], 'platform': sys.platform, 'date': time.strftime('%Y-%m-%d %H:%M:%S'), 'shapes': {}}
+    for name, shape in shapes.items():
+        res = results['shapes'][name] = bench_shape(shape, repeat)
+        print(f"[BENCH] {name}: {shape['entries']} entries x {shape['strings']} strings, {res['bytes'] / 1e6:.2f} MB")
+        for phase, m in res['phases'].items():
+            print(f"    {phase:<12} {m['seconds'] * 1000:9.2f} ms {m['strings_per_s']:>11} strings/s {m['mb_per_s']:>9.2f} MB/s {m['peak_kb']:>9} KiB peak")
+    if corpus:
+        res = results['corpus'] = bench_corpus(corpus, repeat)
+        print(f"[BENCH] {corpus}: {res['strings']} strings, {res['bytes'] / 1e6:.2f} MB of code units")
+        for phase, m in res['phases'].items():
+            print(f"    {phase:<16} {m['seconds'] * 1000:9.2f} ms {m['strings_per_s']:>11} strings/s {m['mb_per_s']:>9.2f} MB/s")
+    if output:
+        with open(output, 'w', encoding='utf-8') as f: json.dump(results, f, indent=2)
+        print(f"[SUCCESS] Benchmark results saved: {output}")
+    if not baseline: return 0
+    with open(baseline, encoding='utf-8') as f: regressions = compare_bench(results, json.load(f), threshold)
+    for line in regressions: print(f"[REGRESSION] {line}")
+    if not regressions: print(f"[SUCCESS] No regressions against {baseline}.")
+    return len(regressions)
+
 # ---------- Self-Test and Main Program ---------- #
 
 def selftest():
@@ -198,48 +1421,207 @@ def selftest():
     entry = TxtCodec.build_entry([s])
     decrypted = TxtCodec.get_strings(entry)
     assert len(decrypted) == 1 and decrypted[0] == s, 'Self-test failed!'
+    k, ref = TxtCodec.INIT_KEY, []
+    for c in reversed(TxtCodec.txt_to_codes(s) + [0xFFFF]): ref.append(c ^ k); k = TxtCodec.rotate(k)
+    assert entry.endswith(struct.pack(f'<{len(ref)}H', *reversed(ref))), 'Self-test failed!'
+    t = 'Aé\\xf000\\x0001\\x0000Ő\\xfffe\\x12'
+    units = EscapeCodec.encode(t)
+    assert list(units) == TxtCodec.txt_to_codes(t) and EscapeCodec.decode(units) == TxtCodec.codes_to_txt(units) == t, 'Self-test failed!'
     print('[SELF-TEST] Encoding/decoding algorithm is correct.')
 
 def main():
     parser = argparse.ArgumentParser(description='Pokémon B/W NARC Text Tool (Export/Import)', formatter_class=argparse.RawTextHelpFormatter)
     subparsers = parser.add_subparsers(dest='command', help='Available commands')
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--stats', action='store_true', help='Print per-phase timings, sizes and the slowest entries.')
+    common.add_argument('--stats-json', metavar='FILE', help='Write the phase metrics to this JSON file.')
+    common.add_argument('--profile', metavar='FILE', help='Write a cProfile dump of the run to this file.')
 
-    p_export = subparsers.add_parser('export', help='Export texts from a NARC file.', epilog="Examples:\n  python %(prog)s export a003.narc -o texts.json\n  python %(prog)s export a003.narc -d text_files")
+    p_export = subparsers.add_parser('export', parents=[common], help='Export texts from a NARC file.', epilog="Examples:\n  python %(prog)s export a003.narc -o texts.json\n  python %(prog)s export a003.narc -d text_files")
     p_export.add_argument('input_narc', help='Input NARC file.')
     p_export.add_argument('-o', '--output-json', help='Output JSON file name.')
     p_export.add_argument('-d', '--output-dir', help='Output directory for individual .txt files.')
+    p_export.add_argument('-j', '--jobs', type=int, default=1, help='Number of worker processes (0 = one per CPU core).')
+    p_export.add_argument('--io-threads', type=int, default=4, help='Write the .txt files of a directory export on this many threads (default: 4).')
+    p_export.add_argument('--index', metavar='DB', help='Add the texts to this search index (see the search command).')
+
+    p_show = subparsers.add_parser('show', parents=[common], help='Print the texts of a single entry.', epilog="Examples:\n  python %(prog)s show a003.narc 12\n  python %(prog)s show a003.narc 12 -t 3")
+    p_show.add_argument('input_narc', help='Input NARC file.')
+    p_show.add_argument('entry', type=int, help='Entry index.')
+    p_show.add_argument('-t', '--text', type=int, help='Only print this text index.')
 
-    p_import = subparsers.add_parser('import', help='Import texts back into a NARC file.', epilog="Examples:\n  python %(prog)s import texts.json a003.narc new_a003.narc\n  python %(prog)s import translated_texts/ a003.narc new_a003.narc")
+    p_import = subparsers.add_parser('import', parents=[common], help='Import texts back into a NARC file.', epilog="Examples:\n  python %(prog)s import texts.json a003.narc new_a003.narc\n  python %(prog)s import translated_texts/ a003.narc new_a003.narc")
     p_import.add_argument('input_source', help='Input source (JSON file or directory).')
     p_import.add_argument('narc_original', help='The original NARC file.')
     p_import.add_argument('narc_output', help='The name for the new, output NARC file.')
+    p_import.add_argument('--cache-dir', help='Directory for caching encoded entries between imports.')
+    p_import.add_argument('-j', '--jobs', type=int, default=1, help='Number of worker processes (0 = one per CPU core).')
+    p_import.add_argument('--io-threads', type=int, default=0, help='Read the .txt files of a directory source on this many threads.')
+    p_import.add_argument('--index', action='store_true', help='Keep a sidecar index in the directory source and skip files unchanged since the last import.')
+    p_import.add_argument('--strict', action='store_true', help='Stop on malformed \\xNNNN escape sequences instead of keeping them as text.')
     
+    p_patch = subparsers.add_parser('patch', parents=[common], help='Import texts by patching a NARC file in place.', epilog="Examples:\n  python %(prog)s patch texts.json a003.narc\n  python %(prog)s patch translated_texts/ a003.narc -o new_a003.narc")
+    p_patch.add_argument('input_source', help='Input source (JSON file or directory).')
+    p_patch.add_argument('narc', help='The NARC file to patch.')
+    p_patch.add_argument('-o', '--output', help='Patch a copy with this name instead of the original file.')
+    p_patch.add_argument('--cache-dir', help='Directory for caching encoded entries between imports.')
+    p_patch.add_argument('-j', '--jobs', type=int, default=1, help='Number of worker processes (0 = one per CPU core).')
+    p_patch.add_argument('--strict', action='store_true', help='Stop on malformed \\xNNNN escape sequences instead of keeping them as text.')
+
+    p_export_batch = subparsers.add_parser('export-batch', parents=[common], help='Export every NARC of a directory or manifest in one run.', epilog="Examples:\n  python %(prog)s export-batch narcs/ exported/\n  python %(prog)s export-batch archives.txt exported/ -f dir -j 0")
+    p_export_batch.add_argument('input', help='Directory of NARC files (searched recursively) or a manifest listing one NARC per line.')
+    p_export_batch.add_argument('output_dir', help='Output directory; a summary.json is written here as well.')
+    p_export_batch.add_argument('-f', '--format', choices=['json', 'dir'], default='json', help='Export each archive as a JSON file or as a directory of .txt files.')
+    p_export_batch.add_argument('-j', '--jobs', type=int, default=0, help='Number of worker processes (0 = one per CPU core).')
+    p_export_batch.add_argument('--index', metavar='DB', help='Add the texts of every archive to this search index.')
+
+    p_diff = subparsers.add_parser('diff', parents=[common], help='Show the texts that differ between two NARC files.', epilog="Examples:\n  python %(prog)s diff old_a003.narc a003.narc\n  python %(prog)s diff old_a003.narc a003.narc --json changes.json")
+    p_diff.add_argument('old_narc', help='The older NARC file.')
+    p_diff.add_argument('new_narc', help='The newer NARC file.')
+    p_diff.add_argument('--json', metavar='FILE', help='Also write the differences to this JSON file.')
+
+    p_search = subparsers.add_parser('search', parents=[common], help='Find texts in the archives of a search index.', epilog="Examples:\n  python %(prog)s search texts.db humble maid\n  python %(prog)s search texts.db \"big heart\" -n 10")
+    p_search.add_argument('index', help='Search index built with export --index.')
+    p_search.add_argument('query', nargs='+', help='Words that must all appear in the text (case-insensitive).')
+    p_search.add_argument('-n', '--limit', type=int, default=50, help='Maximum number of results (default: 50).')
+    p_search.add_argument('--json', metavar='FILE', help='Also write the results to this JSON file.')
+
+    p_import_batch = subparsers.add_parser('import-batch', parents=[common], help='Import translations into every NARC of a directory or manifest in one run.', epilog="Examples:\n  python %(prog)s import-batch exported/ narcs/ rebuilt/\n  python %(prog)s import-batch exported/ archives.txt rebuilt/ --cache-dir cache")
+    p_import_batch.add_argument('input_source', help='Directory holding one <name>.json or <name>/ translation source per archive.')
+    p_import_batch.add_argument('narc_input', help='Directory of original NARC files or a manifest listing one NARC per line.')
+    p_import_batch.add_argument('output_dir', help='Output directory for the new NARC files and summary.json.')
+    p_import_batch.add_argument('--cache-dir', help='Directory for caching encoded entries between imports.')
+    p_import_batch.add_argument('-j', '--jobs', type=int, default=0, help='Number of worker processes (0 = one per CPU core).')
+
+    p_watch = subparsers.add_parser('watch', parents=[common], help='Rebuild a NARC file whenever the translations change.', epilog="Examples:\n  python %(prog)s watch translated_texts/ a003.narc new_a003.narc\n  python %(prog)s watch texts.json a003.narc new_a003.narc -i 0.2")
+    p_watch.add_argument('input_source', help='Input source (JSON file or directory).')
+    p_watch.add_argument('narc_original', help='The original NARC file.')
+    p_watch.add_argument('narc_output', help='The NARC file to keep up to date.')
+    p_watch.add_argument('-i', '--interval', type=float, default=0.5, help='Seconds between checks for changes (default: 0.5).')
+
+    p_prefill = subparsers.add_parser('prefill', parents=[common], help='Fill untranslated texts from earlier translations.', epilog="Examples:\n  python %(prog)s prefill new_texts.json old_texts.json -o prefilled.json\n  python %(prog)s prefill new_texts.json a002.json a003.json -o prefilled.json -t 0.9")
+    p_prefill.add_argument('input_json', help='Exported JSON file to fill in.')
+    p_prefill.add_argument('memory', nargs='+', help='Translated JSON files used as the translation memory.')
+    p_prefill.add_argument('-o', '--output', required=True, help='Output JSON file name.')
+    p_prefill.add_argument('-t', '--threshold', type=float, default=0.8, help='Minimum similarity (0-1) of a near match (default: 0.8).')
+
+    p_serve = subparsers.add_parser('serve', parents=[common], help='Keep NARC files loaded and answer requests from other programs.', epilog="Examples:\n  python %(prog)s serve a003.narc --port 8765\n  python %(prog)s serve a002.narc a003.narc --socket /tmp/narc.sock\n\nRequests are JSON objects: {\"op\": \"get\", \"archive\": \"a003\", \"entry\": 12}\nOperations: list, get, set (texts or text_index + text), rebuild (output), export (output_json / output_dir).\nHTTP requests must be sent with Content-Type: application/json.")
+    p_serve.add_argument('input_narc', nargs='+', help='NARC files to load (requests name them by file name without the extension).')
+    p_serve.add_argument('--port', type=int, default=8765, help='HTTP port on localhost (default: 8765).')
+    p_serve.add_argument('--socket', help='Listen on this Unix socket (one JSON request per line) instead of HTTP.')
+
+    p_bench = subparsers.add_parser('bench', parents=[common], help='Benchmark the tool on synthetic NARC archives.', epilog="Examples:\n  python %(prog)s bench -o baseline.json\n  python %(prog)s bench --baseline baseline.json --threshold 0.15\n  python %(prog)s bench --entries 1000 --strings 50 --length 80 --control 0.1\n  python %(prog)s bench --corpus szovegek.json")
+    p_bench.add_argument('-o', '--output', help='Save the results to this JSON file.')
+    p_bench.add_argument('--baseline', help='Compare against the results stored in this JSON file.')
+    p_bench.add_argument('--threshold', type=float, default=0.10, help='Allowed slowdown before a phase counts as a regression (default: 0.10 = 10%%).')
+    p_bench.add_argument('--repeat', type=int, default=3, help='Runs per phase; the best time is kept.')
+    p_bench.add_argument('--shape', action='append', choices=list(BENCH_SHAPES), help='Built-in archive shape to run (repeatable; default: all).')
+    p_bench.add_argument('--entries', type=int, help='Custom shape: number of entries.')
+    p_bench.add_argument('--strings', type=int, default=20, help='Custom shape: strings per entry.')
+    p_bench.add_argument('--length', type=int, default=40, help='Custom shape: average string length.')
+    p_bench.add_argument('--control', type=float, default=0.05, help='Custom shape: share of control codes in the strings.')
+    p_bench.add_argument('--corpus', metavar='JSON', help='Also time the escape engine against the reference functions on the texts of this exported JSON file (only this, unless --shape or --entries is given).')
+
     if len(sys.argv) == 1:
         parser.print_help(); sys.exit(0)
 
     args = parser.parse_args()
 
+    profiler = cProfile.Profile() if args.profile else None
     try:
         selftest()
-        if args.command == 'export':
-            if not args.output_json and not args.output_dir: p_export.error("At least one output option must be specified (-o or -d).")
-            narc = NARC.open(args.input_narc)
-            if args.output_json: export_to_json(narc, args.output_json)
-            if args.output_dir: export_to_directory(narc, args.output_dir)
-        elif args.command == 'import':
-            narc = NARC.open(args.narc_original)
-            translations = load_translations(args.input_source, len(narc.entries))
-            if len(translations) != len(narc.entries): print(f"[WARNING] Mismatch in entry count: source ({len(translations)}) vs. NARC ({len(narc.entries)}).")
-            new_entries, count = [], 0
-            for i, original in enumerate(narc.entries):
-                if i < len(translations) and any(translations[i]):
-                    new_entries.append(TxtCodec.build_entry(translations[i])); count += 1
-                else: new_entries.append(original)
-            print(f"[INFO] {count} entries updated.")
-            Path(args.narc_output).write_bytes(narc.rebuild(new_entries))
-            print(f"[SUCCESS] Import finished! The new file is: {args.narc_output}")
+        if profiler: profiler.enable()
+        run_command(args, p_export)
     except Exception as ex:
         print(f'[ERROR] {ex}', file=sys.stderr); sys.exit(1)
+    finally:
+        if profiler: profiler.disable(); profiler.dump_stats(args.profile)
+        if args.stats and STATS.phases: print(STATS.report())
+        if args.stats_json:
+            with open(args.stats_json, 'w', encoding='utf-8') as f: json.dump(STATS.as_dict(), f, indent=2)
+
+def run_command(args, p_export):
+    """Dispatches the parsed command line."""
+    if args.command == 'export':
+        if not args.output_json and not args.output_dir and not args.index: p_export.error("At least one output option must be specified (-o, -d or --index).")
+        with worker_pool(args.jobs) as pool: export_archive(args.input_narc, args.output_json, args.output_dir, pool, args.index, args.io_threads)
+    elif args.command == 'show':
+        with open_archive(args.input_narc) as narc:
+            if not 0 <= args.entry < len(narc.entries): raise IndexError(f"Entry {args.entry} is out of range (0-{len(narc.entries) - 1}).")
+            texts = narc.strings(args.entry)
+            for j, text in enumerate(texts):
+                if args.text is None or args.text == j: print(f"[{j:04d}] {text}")
+    elif args.command == 'import':
+        with worker_pool(args.jobs) as pool: result = import_archive(args.input_source, args.narc_original, args.narc_output, args.cache_dir, pool, args.io_threads, args.index, args.strict)
+        print(f"[INFO] {result['updated']} entries updated.")
+        if args.cache_dir: print(f"[INFO] {result['cached']} entries taken from the cache.")
+        if args.index and os.path.isdir(args.input_source): print(f"[INFO] {result['unchanged']} files unchanged since the last import, served from the index.")
+        print(f"[SUCCESS] Import finished! The new file is: {args.narc_output}")
+    elif args.command == 'patch':
+        with worker_pool(args.jobs) as pool: result = patch_archive(args.input_source, args.narc, args.output, args.cache_dir, pool, args.strict)
+        print(f"[INFO] {result['updated']} entries updated.")
+        if result['updated']: print(f"[INFO] Rewrote {result['written']} bytes from entry {result['first']} onward.")
+        print(f"[SUCCESS] Patch finished: {args.output or args.narc}")
+    elif args.command == 'watch':
+        session = WatchSession(args.input_source, args.narc_original, args.narc_output)
+        try: session.run(args.interval)
+        except KeyboardInterrupt: print("[INFO] Watch stopped.")
+    elif args.command == 'prefill':
+        if not 0 < args.threshold <= 1: raise ValueError("The threshold must be between 0 and 1.")
+        memory = TranslationMemory(args.threshold)
+        with STATS.phase('memory'):
+            for path in args.memory: memory.load(path)
+        print(f"[INFO] Translation memory: {len(memory.exact)} texts.")
+        with STATS.phase('prefill'): counts = prefill_json(args.input_json, memory, args.output)
+        print(f"[INFO] {counts['exact']} exact and {counts['similar']} similar matches filled in, {counts['untranslated']} texts left untranslated.")
+        print(f"[SUCCESS] Prefill finished: {args.output}")
+    elif args.command == 'serve':
+        workspace = Workspace(args.input_narc)
+        try: serve(workspace, args.port, args.socket)
+        except KeyboardInterrupt: print("[INFO] Server stopped.")
+        finally: workspace.close()
+    elif args.command == 'diff':
+        result = diff_archives(args.old_narc, args.new_narc)
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f: json.dump(result, f, ensure_ascii=False, indent=2)
+        marks = {'added': '+', 'removed': '-', 'changed': '~'}
+        for c in result['changes']:
+            print(f"{marks[c['status']]} [{c['entry_index']:04d}:{c['text_index']:04d}]")
+            if 'old' in c: print(f"  - {c['old']}")
+            if 'new' in c: print(f"  + {c['new']}")
+        s = result['summary']
+        print(f"[INFO] {s['differing_entries']} of {s['entries']} entries differ: {s['added']} texts added, {s['removed']} removed, {s['changed']} changed.")
+    elif args.command == 'search':
+        if not os.path.isfile(args.index): raise FileNotFoundError(f"The search index '{args.index}' was not found.")
+        with SearchIndex(args.index) as db:
+            for path in db.stale(): print(f"[WARNING] {path} changed since it was indexed; export it again with --index.", file=sys.stderr)
+            results = db.search(' '.join(args.query), args.limit)
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f: json.dump([{'archive': a, 'entry_index': i, 'text_index': j, 'text': t} for a, i, j, t in results], f, ensure_ascii=False, indent=2)
+        for a, i, j, t in results: print(f"{a} [{i:04d}:{j:04d}] {t}")
+        print(f"[INFO] {len(results)} matches.")
+    elif args.command == 'bench':
+        shapes = {k: BENCH_SHAPES[k] for k in (args.shape or ([] if args.entries or args.corpus else BENCH_SHAPES))}
+        if args.entries: shapes['custom'] = {'entries': args.entries, 'strings': args.strings, 'length': args.length, 'control': args.control}
+        if run_bench(shapes, args.repeat, args.output, args.baseline, args.threshold, args.corpus): sys.exit(1)
+    elif args.command == 'export-batch':
+        out = Path(args.output_dir); out.mkdir(parents=True, exist_ok=True)
+        tasks = []
+        for narc_path, name in find_archives(args.input):
+            target = out / name; target.parent.mkdir(parents=True, exist_ok=True)
+            outputs = (str(target.with_name(target.name + '.json')), None) if args.format == 'json' else (None, str(target))
+            tasks.append(({'narc': str(narc_path), 'output': outputs[0] or outputs[1]}, export_archive, (str(narc_path), *outputs, None, args.index)))
+        if run_batch('export-batch', tasks, args.output_dir, args.jobs): sys.exit(1)
+    elif args.command == 'import-batch':
+        out = Path(args.output_dir); out.mkdir(parents=True, exist_ok=True)
+        tasks = []
+        for narc_path, name in find_archives(args.narc_input):
+            source = Path(args.input_source) / name
+            if source.with_name(source.name + '.json').is_file(): source = source.with_name(source.name + '.json')
+            target = out / name; target.parent.mkdir(parents=True, exist_ok=True)
+            target = target.with_name(target.name + narc_path.suffix)
+            tasks.append(({'narc': str(narc_path), 'source': str(source), 'output': str(target)}, import_archive, (str(source), str(narc_path), str(target), args.cache_dir)))
+        if run_batch('import-batch', tasks, args.output_dir, args.jobs): sys.exit(1)
 
 if __name__ == '__main__':
     main()
@@ -7,18 +7,139 @@ Ez a verzió magyar nyelvű.
 """
 
 import argparse
+import cProfile
+import heapq
+import hashlib
+import io
 import json
+import math
+import mmap
+import queue
+import re
+import shutil
+import socket
+import socketserver
+import sqlite3
+import stat
+import os
 import struct
 import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext, redirect_stdout
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import islice, zip_longest
 from pathlib import Path
-from random import randint
+from random import Random, randint
+from typing import Optional
+from urllib.parse import urlsplit
+
+IOV_MAX = 1024
 
 # ---------- Segédfüggvények és alaposztályok ---------- #
 
-def pad32(b: bytearray) -> None:
-    """A bájt-tömböt 4-gyel osztható hosszúságúra egészíti ki."""
-    while len(b) % 4:
-        b += b'\xFF'
+def pad32(size: int) -> bytes:
+    """Visszaadja azt a kitöltést, amely a `size` hosszt 4-gyel oszthatóvá teszi."""
+    return b'\xFF' * (-size % 4)
+
+def write_vectored(f, chunks: list) -> None:
+    """Pufferek listáját írja ki os.writev segítségével, ahol elérhető; a részleges írásokat megismétli."""
+    if not hasattr(os, 'writev'):
+        f.writelines(chunks); return
+    views = [memoryview(c).cast('B') for c in chunks if len(c)]
+    while views:
+        n = os.writev(f.fileno(), views[:IOV_MAX])
+        while n:
+            if n >= len(views[0]): n -= len(views.pop(0))
+            else: views[0] = views[0][n:]; n = 0
+
+def worker_pool(jobs: int):
+    """Folyamatkészlet `jobs` munkafolyamattal (0 = magonként egy), vagy üres kontextus egyfolyamatos futáshoz."""
+    jobs = jobs or os.cpu_count() or 1
+    return ProcessPoolExecutor(jobs) if jobs > 1 else nullcontext()
+
+def payloads(entries, pool=None):
+    """A bejegyzések a `pool` számára átküldhető formában (a memoryview szeletek nem pickle-ölhetők)."""
+    return entries if pool is None else map(bytes, entries)
+
+def map_entries(fn, items, pool=None, chunk: int = 16):
+    """Sorrendben alkalmazza az `fn` függvényt minden elemre; folyamatkészlettel az elemeket darabokban, egyszerre egy korlátos ablaknyit szétosztva dolgozza fel."""
+    if pool is None:
+        yield from map(fn, items); return
+    items = iter(items)
+    while batch := list(islice(items, chunk * 64)):
+        yield from pool.map(fn, batch, chunksize=chunk)
+
+def timed_call(fn, item):
+    """Meghívja az fn(item) függvényt, és (eltelt másodpercek, eredmény) párt ad vissza; pickle-ölhető, így a mérés munkafolyamatokban is működik."""
+    start = time.perf_counter()
+    result = fn(item)
+    return time.perf_counter() - start, result
+
+class Stats:
+    """Fázisonkénti mérőszámok (idő, bájtok, bejegyzések, szövegek) és a leglassabb bejegyzések; elég olcsó ahhoz, hogy mindig gyűjtsük."""
+    SLOWEST = 10
+
+    def __init__(self):
+        self.phases = {}
+        self.slowest = []
+
+    def record(self, name: str) -> dict:
+        return self.phases.setdefault(name, {'seconds': 0.0, 'bytes': 0, 'entries': 0, 'strings': 0})
+
+    @contextmanager
+    def phase(self, name: str):
+        rec = self.record(name); start = time.perf_counter()
+        try: yield rec
+        finally: rec['seconds'] += time.perf_counter() - start
+
+    def entry(self, name: str, index: int, seconds: float, strings: int = 0, nbytes: int = 0) -> None:
+        rec = self.record(name)
+        rec['seconds'] += seconds; rec['entries'] += 1; rec['strings'] += strings; rec['bytes'] += nbytes
+        item = (seconds, name, index)
+        if len(self.slowest) < self.SLOWEST: heapq.heappush(self.slowest, item)
+        elif item > self.slowest[0]: heapq.heapreplace(self.slowest, item)
+
+    def timed_iter(self, name: str, items):
+        """Továbbadja az `items` elemeit, az előállításukra fordított időt a `name` fázishoz adva."""
+        rec, items = self.record(name), iter(items)
+        while True:
+            start = time.perf_counter()
+            try: item = next(items)
+            except StopIteration: return
+            finally: rec['seconds'] += time.perf_counter() - start
+            rec['entries'] += 1; rec['strings'] += len(item)
+            yield item
+
+    def as_dict(self) -> dict:
+        return {'phases': {k: {**v, 'seconds': round(v['seconds'], 6)} for k, v in self.phases.items()},
+                'slowest': [{'phase': n, 'entry': i, 'seconds': round(t, 6)} for t, n, i in sorted(self.slowest, reverse=True)]}
+
+    def report(self) -> str:
+        lines = [f"[STATISZTIKA] {'Fázis':<10} {'Idő (ms)':>10} {'Bájt':>12} {'Bejegyzés':>9} {'Szöveg':>8}"]
+        for name, rec in self.phases.items():
+            lines.append(f"              {name:<10} {rec['seconds'] * 1000:>10.2f} {rec['bytes']:>12} {rec['entries']:>9} {rec['strings']:>8}")
+        if self.slowest: lines.append("[STATISZTIKA] Leglassabb bejegyzések: " + ", ".join(f"{n} #{i:04d} ({t * 1000:.2f} ms)" for t, n, i in sorted(self.slowest, reverse=True)))
+        return "\n".join(lines)
+
+STATS = Stats()
+
+def copy_file(src: str, dst: str) -> None:
+    """Fájlt másol a kernelen belül (copy_file_range, amely CoW fájlrendszereken reflinket is használhat), ahol lehetséges."""
+    if not hasattr(os, 'copy_file_range'):
+        shutil.copyfile(src, dst); return
+    with open(src, 'rb') as fin, open(dst, 'wb') as fout:
+        try:
+            while os.copy_file_range(fin.fileno(), fout.fileno(), 1 << 30): pass
+        except OSError:
+            fin.seek(0); fout.seek(0); fout.truncate(); shutil.copyfileobj(fin, fout)
 
 class DS:
     """Egyszerűsített DataStream a bináris adatok írásához és olvasásához."""
@@ -36,79 +157,282 @@ class DS:
 
 class NARC:
     """NARC archívumok beolvasására és újraépítésére szolgáló osztály."""
+    CACHE_SIZE = 64
+
     def __init__(self):
         self.entries = []
+        self.btaf = self.gmif = self.gmif_size = self.size = 0
+        self.offsets = []
+        self._map = None
+        self._strings = OrderedDict()
 
     @classmethod
-    def open(cls, fn: str):
-        raw = Path(fn).read_bytes()
-        if raw[0:4] != b'NARC': raise ValueError(f"'{fn}' nem érvényes NARC fájl.")
-        btaf = raw.find(b'BTAF')
-        if btaf == -1: raise ValueError("Hiányzó BTAF blokk a NARC fájlban.")
-        files = struct.unpack_from('<I', raw, btaf + 8)[0]
-        offs = [struct.unpack_from('<II', raw, btaf + 12 + i*8) for i in range(files)]
-        gmif = raw.find(b'GMIF')
-        if gmif == -1: raise ValueError("Hiányzó GMIF blokk a NARC fájlban.")
-        gmif_data_start = gmif + 8
+    def open(cls, fn: str, lazy: bool = False):
+        """Megnyit egy NARC fájlt. `lazy` esetén a fájl memóriába van leképezve, a bejegyzések pedig másolás nélküli memoryview szeletek."""
+        if lazy:
+            with open(fn, 'rb') as f: raw = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else: raw = Path(fn).read_bytes()
         nar = cls()
-        for s, e in offs: nar.entries.append(raw[gmif_data_start + s: gmif_data_start + e])
+        try:
+            if raw[0:4] != b'NARC': raise ValueError(f"'{fn}' nem érvényes NARC fájl.")
+            btaf = raw.find(b'BTAF')
+            if btaf == -1: raise ValueError("Hiányzó BTAF blokk a NARC fájlban.")
+            files = struct.unpack_from('<I', raw, btaf + 8)[0]
+            offs = [struct.unpack_from('<II', raw, btaf + 12 + i*8) for i in range(files)]
+            gmif = raw.find(b'GMIF')
+            if gmif == -1: raise ValueError("Hiányzó GMIF blokk a NARC fájlban.")
+            gmif_size = struct.unpack_from('<I', raw, gmif + 4)[0]
+        except Exception:
+            if lazy: raw.close()
+            raise
+        gmif_data_start = gmif + 8
+        nar.btaf, nar.gmif, nar.gmif_size, nar.size, nar.offsets = btaf, gmif, gmif_size, len(raw), offs
+        view = raw
+        if lazy: nar._map = raw; view = memoryview(raw)
+        for s, e in offs: nar.entries.append(view[gmif_data_start + s: gmif_data_start + e])
         return nar
 
-    def rebuild(self, new_entries: list[bytes]) -> bytes:
+    def patch(self, fn: str, new_entries: list[bytes], first: int) -> int:
+        """Helyben újraírja az `fn` fájlt (ezt az archívumot vagy a másolatát) a `first` bejegyzéstől kezdve: a GMIF végét,
+        a BTAF eltolásokat és a fejléc méreteit. Az első módosult bejegyzés előtti bájtokhoz nem nyúl. A kiírt bájtok számát adja vissza."""
+        if self.gmif + self.gmif_size != self.size or len(new_entries) != len(self.offsets):
+            raise ValueError("Az archívum szerkezete nem teszi lehetővé a helyben javítást.")
+        data_start = self.gmif + 8
+        start = cur = self.offsets[first][0]
+        table = array('I')
+        for e in new_entries[first:]:
+            table.append(cur); cur += len(e); table.append(cur)
+        if sys.byteorder == 'big': table.byteswap()
+        total = data_start + cur + -(data_start + cur) % 4
+        tail = b''.join([*new_entries[first:], pad32(data_start + cur)])
+        self.close()
+        with STATS.phase('write') as rec, open(fn, 'r+b') as f:
+            f.seek(data_start + start); f.write(tail); f.truncate(total)
+            f.seek(self.btaf + 12 + first * 8); f.write(table.tobytes())
+            f.seek(8); f.write(struct.pack('<I', total))
+            f.seek(self.gmif + 4); f.write(struct.pack('<I', total - self.gmif))
+            written = len(tail) + len(table) * 4 + 8
+            rec['bytes'] += written
+        return written
+
+    def strings(self, i: int) -> list[str]:
+        """Az `i`. bejegyzés dekódolt szövegei; első hozzáféréskor dekódolja, és korlátos LRU gyorsítótárban tartja."""
+        if i in self._strings:
+            self._strings.move_to_end(i); return self._strings[i]
+        texts = self._strings[i] = TxtCodec.get_strings(self.entries[i])
+        if len(self._strings) > self.CACHE_SIZE: self._strings.popitem(last=False)
+        return texts
+
+    def close(self):
+        """Felszabadítja a lustán megnyitott archívum memórialeképezését."""
+        if self._map is None: return
+        for e in self.entries: e.release()
+        self.entries = []; self._strings.clear()
+        self._map.close(); self._map = None
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()
+
+    @staticmethod
+    def layout(sizes: list[int]) -> bytes:
+        """Felépíti a fejlécet, a BTAF, BTNF és GMIF fejlécet a megadott méretű bejegyzésekhez."""
         out = DS()
         out.w(b'NARC'); out.w16(0xFFFE); out.w16(0x0100); out.w32(0); out.w16(0x10); out.w16(3)
-        btaf_start = len(out.d); out.w(b'BTAF'); out.w32(0); out.w32(len(new_entries))
+        btaf_start = len(out.d); out.w(b'BTAF'); out.w32(0); out.w32(len(sizes))
         cur = 0
-        for e in new_entries:
-            out.w32(cur); cur += len(e); out.w32(cur)
+        for size in sizes:
+            out.w32(cur); cur += size; out.w32(cur)
         out.w(b'BTNF'); out.w32(0x10); out.w32(4); out.w16(0x10000); out.w16(1)
         gmif_start = len(out.d); out.w(b'GMIF'); out.w32(0)
-        for e in new_entries: out.w(e)
-        pad32(out.d)
-        total = len(out.d)
+        total = len(out.d) + cur; total += -total % 4
         struct.pack_into('<I', out.d, 8, total)
         struct.pack_into('<I', out.d, btaf_start + 4, gmif_start - btaf_start)
         struct.pack_into('<I', out.d, gmif_start + 4, total - gmif_start)
         return bytes(out.d)
 
+    def rebuild(self, new_entries: list[bytes]) -> bytes:
+        head = self.layout([len(e) for e in new_entries])
+        size = len(head) + sum(len(e) for e in new_entries)
+        return b''.join([head, *new_entries, pad32(size)])
+
+    def write(self, fn: str, new_entries: list[bytes]) -> int:
+        """Az újraépített archívumot vektoros írásokkal folyamatosan a `fn` fájlba írja, a memóriában való felépítése nélkül. A fájl méretét adja vissza."""
+        with STATS.phase('rebuild') as rec:
+            head = self.layout([len(e) for e in new_entries])
+            size = len(head) + sum(len(e) for e in new_entries)
+            rec['entries'] += len(new_entries); rec['bytes'] += size + -size % 4
+        tmp = Path(fn).with_name(Path(fn).name + '.tmp')
+        try:
+            with STATS.phase('write') as rec, open(tmp, 'wb', buffering=0 if hasattr(os, 'writev') else -1) as f:
+                rec['bytes'] += size + -size % 4
+                write_vectored(f, [head])
+                for i in range(0, len(new_entries), IOV_MAX): write_vectored(f, new_entries[i:i + IOV_MAX])
+                write_vectored(f, [pad32(size)])
+            os.replace(tmp, fn)
+        except BaseException:
+            tmp.unlink(missing_ok=True); raise
+        return size + -size % 4
+
 # ---------- Szöveg Kódolás (IMPORT) és Dekódolás (EXPORT) ---------- #
 
+class EscapeCodec:
+    """Átalakít a kódegységek és az exportált szöveg között; a nem sima szöveges egységek \\xNNNN alakban szerepelnek.
+    Az import előre lefordított regexes tokenizáló; az export egyszerre dekódolja a teljes szöveget, és a vezérlőkód-sorozatokat egyben escape-eli."""
+    CANDIDATE = re.compile(r'\\x(.{4})?', re.S)
+    ESCAPE = re.compile(r'\\x([0-9a-fA-F]{4})')
+    HEX4 = re.compile(r'[0-9a-fA-F]{4}')
+    ESCAPED = re.compile('[\x00-\x1f\uf000\ud800-\udfff\ufff1-\uffff\U00010000-\U0010ffff]+')
+    RUN_CACHE_SIZE = 4096
+    _runs: dict[str, str] = {}
+
+    @staticmethod
+    def literal(text: str) -> array:
+        """Sima szöveg kódegységei (az U+FFFF feletti karaktereket 16 bitre vágja, mint az ord(c) & 0xFFFF)."""
+        if not text: return array('H')
+        if max(text) > '\uffff': return array('H', [ord(c) & 0xFFFF for c in text])
+        units = array('H', text.encode('utf-16-le', 'surrogatepass'))
+        if sys.byteorder == 'big': units.byteswap()
+        return units
+
+    @classmethod
+    def encode(cls, text: str, strict: bool = False) -> array:
+        """Feldolgozza a \\xNNNN escape-eket. Megengedő módban a korábbi feldolgozóval egyezik (bármi, amit az int(..., 16)
+        elfogad, különben a visszaper szövegként marad); szigorú módban csak négy hexa számjegyet fogad el, egyébként ValueError."""
+        if '\\x' not in text: return cls.literal(text)
+        plain = cls.ESCAPE.sub(lambda m: chr(int(m.group(1), 16)), text)
+        if '\\x' not in plain: return cls.literal(plain)
+        units, pos = array('H'), 0
+        while (m := cls.CANDIDATE.search(text, pos)):
+            digits, value = m.group(1), None
+            if digits is not None:
+                if cls.HEX4.fullmatch(digits): value = int(digits, 16)
+                elif not strict:
+                    try: value = int(digits, 16) & 0xFFFF
+                    except ValueError: pass
+            if value is None:
+                if strict: raise ValueError(f"Hibás escape-szekvencia a(z) {m.start()}. pozíción: {text[m.start():m.start() + 6]!r}")
+                units.extend(cls.literal(text[pos:m.start() + 1])); pos = m.start() + 1; continue
+            units.extend(cls.literal(text[pos:m.start()])); units.append(value); pos = m.end()
+        units.extend(cls.literal(text[pos:]))
+        return units
+
+    @classmethod
+    def escape_run(cls, m) -> str:
+        """Escape-eli a nem szöveges egységek sorozatát; a sorozatokat gyorsítótárazza, mivel ugyanazok a vezérlőkódok ismétlődnek a játékban."""
+        run = m.group()
+        text = cls._runs.get(run)
+        if text is None:
+            units = array('H', run.encode('utf-16-le', 'surrogatepass'))
+            if sys.byteorder == 'big': units.byteswap()
+            text = ''.join(f"\\x{c:04x}" for c in units if c != 0xFFFF)
+            if len(cls._runs) < cls.RUN_CACHE_SIZE: cls._runs[run] = text
+        return text
+
+    @classmethod
+    def decode(cls, units: array) -> str:
+        """Kódegységekből exportált szöveget készít: a 0xFFFF kimarad, a vezérlő és helyettesítő (surrogate) egységek \\xNNNN alakúak lesznek."""
+        if sys.byteorder == 'big': units = array('H', units); units.byteswap()
+        return cls.ESCAPED.sub(cls.escape_run, units.tobytes().decode('utf-16-le', 'surrogatepass'))
+
+class StringTable:
+    """Egy bejegyzés dekódolt szövegei: a kódegységek egy közös array('H') pufferben, az eltolások és hosszak tömbökben.
+    A szövegek csak hozzáféréskor lesznek escape-elt `str`-ek; egyébként a szövegek csak olvasható listájaként viselkedik."""
+    __slots__ = ('units', 'offsets', 'lengths')
+
+    def __init__(self, units: Optional[array] = None, offsets: Optional[array] = None, lengths: Optional[array] = None):
+        self.units = array('H') if units is None else units
+        self.offsets = array('I') if offsets is None else offsets
+        self.lengths = array('I') if lengths is None else lengths
+
+    def __len__(self) -> int: return len(self.lengths)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice): return [self[k] for k in range(*i.indices(len(self)))]
+        start = self.offsets[i]
+        return EscapeCodec.decode(self.units[start:start + self.lengths[i]])
+
+    def __iter__(self):
+        for start, count in zip(self.offsets, self.lengths): yield EscapeCodec.decode(self.units[start:start + count])
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, StringTable) and (self.units, self.offsets, self.lengths) == (other.units, other.offsets, other.lengths): return True
+        if not isinstance(other, (StringTable, list, tuple)): return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    __hash__ = None
+
+    def __repr__(self) -> str: return f"StringTable({list(self)!r})"
+
 class TxtCodec:
     INIT_KEY = 0x1234
+    _cycles: dict[int, bytes] = {}
 
     @staticmethod
-    def get_strings(data: bytes) -> list[str]:
-        if len(data) < 12: return []
-        ds = DS(data)
+    def rotate(key: int) -> int: return ((key >> 3) | (key << 13)) & 0xFFFF
+
+    @classmethod
+    def keystream(cls, key: int, count: int) -> bytes:
+        """Kis-endián kulcsok `count` szóhoz, az utolsót a `key` kulccsal XOR-olja. A forgatás periódusa 16, ezért kulcsonként
+        csak a 32 bájtos ciklus kerül a gyorsítótárba, és igény szerint ismétlődik."""
+        cycle = cls._cycles.get(key)
+        if cycle is None:
+            words, k = [], key
+            for _ in range(16): words.append(k); k = cls.rotate(k)
+            cycle = cls._cycles[key] = struct.pack('<16H', *reversed(words))
+        ks = cycle * -(-count // 16)
+        return ks[len(ks) - count * 2:]
+
+    @staticmethod
+    def xor(data: bytes, keys: bytes) -> bytes:
+        """Két azonos hosszúságú puffert XOR-ol egyetlen nagyegész-művelettel."""
+        return (int.from_bytes(data, 'little') ^ int.from_bytes(keys, 'little')).to_bytes(len(data), 'little')
+
+    @staticmethod
+    def to_words(data: bytes) -> array:
+        words = array('H', data)
+        if sys.byteorder == 'big': words.byteswap()
+        return words
+
+    @staticmethod
+    def from_words(words: array) -> bytes:
+        if sys.byteorder == 'big': words = array('H', words); words.byteswap()
+        return words.tobytes()
+
+    @classmethod
+    def decrypt(cls, data: bytes, spans: list[tuple[int, int]]) -> array:
+        """Egy bejegyzés összes (start, count) szövegét egy menetben dekódolja, és az összefűzött kódegységeket adja vissza."""
+        raw, keys = [], []
+        for start, count in spans:
+            if not count: continue
+            end = start + count * 2
+            raw.append(data[start:end])
+            keys.append(cls.keystream(struct.unpack_from('<H', data, end - 2)[0] ^ 0xFFFF, count))
+        return cls.to_words(cls.xor(b''.join(raw), b''.join(keys)))
+
+    @classmethod
+    def get_strings(cls, data: bytes) -> StringTable:
+        if len(data) < 12: return StringTable()
         try:
-            ds.seek(2); num_entries = ds.r16(); ds.seek(12)
-            section_offset = ds.r32()
-            if section_offset >= len(data): return []
-            ds.seek(section_offset); ds.r32()
-            table = []
-            for _ in range(num_entries):
-                if ds.remaining() < 8: break
-                table.append({'offset': ds.r32(), 'count': ds.r16()})
-                ds.seek(ds.tell() + 2)
-            strings = []
-            for entry in table:
-                text_start = section_offset + entry['offset']
-                if text_start + (entry['count'] * 2) > len(data): continue
-                ds.seek(text_start)
-                enc_chars = [ds.r16() for _ in range(entry['count'])]
-                if not enc_chars:
-                    strings.append(""); continue
-                key = enc_chars[-1] ^ 0xFFFF
-                for k in range(len(enc_chars) - 1, -1, -1):
-                    enc_chars[k] ^= key
-                    if k > 0: key = ((key >> 3) | (key << 13)) & 0xFFFF
-                decoded_str = "".join(chr(c) if 0x20 <= c <= 0xFFF0 and c != 0xF000 and not (0xD800 <= c <= 0xDFFF) else f"\\x{c:04x}" for c in enc_chars if c != 0xFFFF)
-                strings.append(decoded_str)
-            return strings
-        except (IndexError, struct.error): return []
+            num_entries, section_offset = struct.unpack_from('<H', data, 2)[0], struct.unpack_from('<I', data, 12)[0]
+            if section_offset + 4 > len(data): return StringTable()
+            table_start = section_offset + 4
+            num_entries = min(num_entries, (len(data) - table_start) // 8)
+            spans = [(section_offset + offset, count) for offset, count in struct.iter_unpack('<IH2x', data[table_start:table_start + num_entries * 8])]
+            spans = [(start, count) for start, count in spans if start + count * 2 <= len(data)]
+            offsets, lengths = array('I'), array('I', [count for _, count in spans])
+            pos = 0
+            for count in lengths: offsets.append(pos); pos += count
+            return StringTable(cls.decrypt(data, spans), offsets, lengths)
+        except (IndexError, struct.error): return StringTable()
+
+    @staticmethod
+    def codes_to_txt(codes) -> str:
+        """Referencia-dekódoló az EscapeCodec.decode-hoz (kódegységenként)."""
+        return "".join(chr(c) if 0x20 <= c <= 0xFFF0 and c != 0xF000 and not (0xD800 <= c <= 0xDFFF) else f"\\x{c:04x}" for c in codes if c != 0xFFFF)
 
     @staticmethod
     def txt_to_codes(txt: str) -> list[int]:
+        """Referencia-feldolgozó az EscapeCodec.encode megengedő módjához (karakterenként)."""
         codes, i = [], 0
         while i < len(txt):
             if txt[i:i+2] == '\\x' and i+5 < len(txt):
@@ -121,23 +445,23 @@ class TxtCodec:
     @classmethod
     def encrypt(cls, codes: list[int]) -> bytes:
         if not codes: return b''
-        k = cls.INIT_KEY; keys = {}
-        for idx in range(len(codes), -1, -1):
-            keys[idx] = k
-            if idx: k = ((k >> 3) | (k << 13)) & 0xFFFF
-        enc = [(c ^ keys[i]) & 0xFFFF for i, c in enumerate(codes)]
-        enc.append(cls.INIT_KEY ^ 0xFFFF)
-        return struct.pack(f'<{len(enc)}H', *enc)
+        plain = array('H', codes); plain.append(0xFFFF)
+        return cls.xor(cls.from_words(plain), cls.keystream(cls.INIT_KEY, len(plain)))
 
     @classmethod
-    def build_entry(cls, texts: list[str]) -> bytes:
-        chunks = [cls.encrypt(cls.txt_to_codes(t)) for t in texts]
+    def build_entry(cls, texts: list[str], strict: bool = False) -> bytes:
+        plain, keys, sizes = array('H'), [], []
+        for t in texts:
+            codes = EscapeCodec.encode(t, strict)
+            if codes: plain.extend(codes); plain.append(0xFFFF); keys.append(cls.keystream(cls.INIT_KEY, len(codes) + 1))
+            sizes.append(len(codes) + 1 if codes else 0)
+        strings = cls.xor(cls.from_words(plain), b''.join(keys))
         section_builder = DS(); section_builder.w32(0)
         offset = 4 + len(texts) * 8
-        for chunk in chunks:
-            section_builder.w32(offset); section_builder.w16(len(chunk) // 2); section_builder.w16(0x0100)
-            offset += len(chunk)
-        for chunk in chunks: section_builder.w(chunk)
+        for size in sizes:
+            section_builder.w32(offset); section_builder.w16(size); section_builder.w16(0x0100)
+            offset += size * 2
+        section_builder.w(strings)
         struct.pack_into('<I', section_builder.d, 0, len(section_builder.d))
         entry_header = DS()
         entry_header.w16(1); entry_header.w16(len(texts)); entry_header.w32(len(section_builder.d))
@@ -146,51 +470,950 @@ class TxtCodec:
 
 # ---------- Export és Import segédfüggvények ---------- #
 
-def export_to_json(narc: NARC, json_path: str):
-    data = {'entries': [{'entry_index': i, 'texts': [{'text_index': j, 'original_text': t, 'translated_text': t} for j, t in enumerate(TxtCodec.get_strings(b))]} for i, b in enumerate(narc.entries)]}
+def write_json_entries(json_path: str, entries) -> None:
+    """Bejegyzésenként írja ki a {"entries": [...]} szerkezetet, pontosan a json.dump(..., indent=2) formázásával."""
     with open(json_path, 'w', encoding='utf-8', errors='surrogatepass') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.write('{\n  "entries": [')
+        empty = True
+        for entry in entries:
+            f.write('\n    ' if empty else ',\n    ')
+            f.write(json.dumps(entry, ensure_ascii=False, indent=2).replace('\n', '\n    '))
+            empty = False
+        f.write(']\n}' if empty else '\n  ]\n}')
+
+def iter_json_entries(json_path: str, chunk_size: int = 1 << 16):
+    """Egyenként adja vissza az "entries" tömb (vagy egy legfelső szintű tömb) objektumait, a fájlt fokozatosan olvasva.
+    Az elemzési hibák a teljes fájlon belüli pozíciót jelzik, ahogy a json.load is."""
+    decoder = json.JSONDecoder()
+    with open(json_path, encoding='utf-8', errors='surrogatepass') as f:
+        buf, pos, eof = '', 0, False
+        base, line, col = 0, 1, 1  # a buf[0] pozíciója a fájlban
+
+        def more() -> bool:
+            nonlocal buf, pos, eof, base, line, col
+            if eof: return False
+            data = f.read(max(chunk_size, len(buf) - pos))
+            dropped = buf[:pos]
+            if '\n' in dropped: line, col = line + dropped.count('\n'), len(dropped) - dropped.rfind('\n')
+            else: col += len(dropped)
+            base += len(dropped)
+            buf, pos, eof = buf[pos:] + data, 0, not data
+            return bool(data)
+
+        def where(p: int) -> str:
+            n = buf.count('\n', 0, p)
+            column = p - buf.rfind('\n', 0, p) if n else col + p
+            return f"line {line + n} column {column} (char {base + p}), fájl: '{json_path}'"
+
+        def peek() -> str:
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos] in ' \t\r\n': pos += 1
+                if pos < len(buf) or not more(): return buf[pos:pos + 1]
+
+        def value():
+            nonlocal pos
+            peek()
+            while True:
+                try:
+                    obj, end = decoder.raw_decode(buf, pos)
+                    if end < len(buf) or eof: pos = end; return obj
+                except json.JSONDecodeError as ex:
+                    if eof: raise ValueError(f"{ex.msg}: {where(ex.pos)}") from None
+                more()
+
+        def expect(c: str) -> None:
+            nonlocal pos
+            if peek() != c: raise ValueError(f"Érvénytelen JSON: '{c}' helyett '{peek()}' található: {where(pos)}")
+            pos += 1
+
+        if peek() == '{':
+            expect('{')
+            while peek() == '"':
+                key = value(); expect(':')
+                if key == 'entries': break
+                value()
+                if peek() == ',': pos += 1
+            else: raise ValueError("A JSON fájlban nincs 'entries' lista.")
+        expect('[')
+        if peek() == ']': return
+        while True:
+            yield value()
+            if peek() != ',': break
+            pos += 1
+        expect(']')
+
+def decode_entries(narc: NARC, pool=None):
+    """Sorban dekódolja az összes bejegyzést (ha meg van adva, a `pool` segítségével), bejegyzésenként mérve az időt."""
+    timed = partial(timed_call, TxtCodec.get_strings)
+    for i, (seconds, texts) in enumerate(map_entries(timed, payloads(narc.entries, pool), pool)):
+        STATS.entry('decode', i, seconds, len(texts), len(narc.entries[i]))
+        yield texts
+
+def export_to_json(narc: NARC, json_path: str, pool=None, decoded=None):
+    if decoded is None: decoded = decode_entries(narc, pool)
+    write_json_entries(json_path, ({'entry_index': i, 'texts': [{'text_index': j, 'original_text': t, 'translated_text': t} for j, t in enumerate(texts)]} for i, texts in enumerate(decoded)))
     print(f"[SIKER] Exportálás befejezve: {json_path}")
 
-def export_to_directory(narc: NARC, dir_path: str):
+def format_text_file(i: int, texts) -> bytes:
+    """Egy bejegyzés teljes NNNN.txt fájlját adja vissza egyetlen pufferként, a platform sorvégeivel."""
+    content = ''.join([f"# Bejegyzés {i:04d}\n\n", *(f"[{j:04d}]\n{text}\n\n" for j, text in enumerate(texts))])
+    if os.linesep != '\n': content = content.replace('\n', os.linesep)
+    return content.encode('utf-8', 'surrogatepass')
+
+def write_if_changed(path: Path, data: bytes) -> bool:
+    """Egyetlen hívással kiírja a `data` tartalmat, hacsak a fájl már pontosan ezeket a bájtokat tartalmazza; visszaadja, hogy írt-e."""
+    try:
+        if path.stat().st_size == len(data) and path.read_bytes() == data: return False
+    except FileNotFoundError: pass
+    with open(path, 'wb') as f: f.write(data)
+    return True
+
+def write_text_directory(dir_path: str, entries, io_threads: int = 0) -> tuple[int, int]:
+    """Minden bejegyzés szövegeit a <dir_path>/0000/NNNN.txt fájlba írja, kihagyva az üres bejegyzéseket és a változatlan
+    tartalmú fájlokat. `io_threads` esetén a bejegyzések dekódolása és formázása közben egy korlátos sor látja el az író
+    szálakat. Visszaadja a fájlok számát és azt, hogy közülük hányat írt ki."""
     p = Path(dir_path); p.mkdir(exist_ok=True)
     lang_dir = p / "0000"; lang_dir.mkdir(exist_ok=True)
-    count = 0
-    for i, entry_bytes in enumerate(narc.entries):
-        texts = TxtCodec.get_strings(entry_bytes)
-        if not texts: continue
-        with open(lang_dir / f"{i:04d}.txt", 'w', encoding='utf-8', errors='surrogatepass') as f:
-            f.write(f"# Bejegyzés {i:04d}\n\n")
-            for j, text in enumerate(texts): f.write(f"[{j:04d}]\n{text}\n\n")
-        count += 1
+    files = ((lang_dir / f"{i:04d}.txt", format_text_file(i, texts)) for i, texts in enumerate(entries) if texts)
+    if io_threads <= 1:
+        results = [write_if_changed(path, data) for path, data in files]
+        return len(results), sum(results)
+    jobs, results, errors = queue.Queue(maxsize=io_threads * 4), [], []
+
+    def writer():
+        while (job := jobs.get()) is not None:
+            if errors: continue
+            try: results.append(write_if_changed(*job))
+            except Exception as ex: errors.append(ex)
+
+    threads = [threading.Thread(target=writer, daemon=True) for _ in range(io_threads)]
+    for t in threads: t.start()
+    try:
+        for job in files:
+            if errors: break
+            jobs.put(job)
+    finally:
+        for _ in threads: jobs.put(None)
+        for t in threads: t.join()
+    if errors: raise errors[0]
+    return len(results), sum(results)
+
+def export_to_directory(narc: NARC, dir_path: str, pool=None, io_threads: int = 4, decoded=None):
+    if decoded is None: decoded = decode_entries(narc, pool)
+    count, written = write_text_directory(dir_path, decoded, io_threads)
+    if written < count: print(f"[INFO] {count - written} fájl már naprakész volt, ezekhez nem nyúlt.")
     print(f"[SIKER] {count} bejegyzés exportálva a(z) '{dir_path}' mappába.")
 
-def load_translations(source_path: str, num_entries: int) -> list[list[str]]:
+TEXT_HEADER = re.compile(r'^\[(.*)\]$', re.M)
+TEXT_FILE = re.compile(r'^(\d{4,})\.txt$')
+
+def parse_text_file(content: str) -> list[str]:
+    """Egymenetes tokenizáló egy exportált NNNN.txt fájlhoz: [NNNN] fejlécek, mindegyik után a hozzá tartozó szöveg; a '#' sorok megjegyzések."""
+    parts, texts = TEXT_HEADER.split(content), {}
+    for k in range(1, len(parts), 2):
+        try: idx = int(parts[k])
+        except ValueError: continue
+        if idx == -1: continue
+        body = parts[k + 1]
+        if '#' in body: body = '\n'.join(line for line in body.split('\n') if not line.startswith('#'))
+        texts[idx] = body.strip()
+    return [texts.get(j, "") for j in range(max(texts.keys()) + 1)] if texts else []
+
+class TextIndex:
+    """Egy szövegmappa kísérő indexe: minden fájl módosítási ideje, mérete, hash-e és feldolgozott szövegei, így a változatlan fájlok kihagyhatók."""
+    NAME = '.index.json'
+    VERSION = 1
+
+    def __init__(self, lang_dir: Path):
+        self.path, self.files, self.dirty, self.skipped = lang_dir / self.NAME, {}, False, 0
+        try:
+            with open(self.path, encoding='utf-8', errors='surrogatepass') as f: data = json.load(f)
+            if data.get('version') == self.VERSION: self.files = data['files']
+        except (OSError, ValueError, KeyError): pass
+
+    def load(self, name: str, path: str, st: os.stat_result) -> list[str]:
+        rec = self.files.get(name)
+        if rec and rec['mtime_ns'] == st.st_mtime_ns and rec['size'] == st.st_size:
+            self.skipped += 1; return rec['texts']
+        with open(path, 'r', encoding='utf-8', errors='surrogatepass') as f: content = f.read()
+        digest = hashlib.blake2b(content.encode('utf-8', 'surrogatepass'), digest_size=16).hexdigest()
+        texts = rec['texts'] if rec and rec['hash'] == digest else parse_text_file(content)
+        self.files[name] = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'hash': digest, 'texts': texts}
+        self.dirty = True
+        return texts
+
+    def save(self) -> None:
+        if not self.dirty: return
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8', errors='surrogatepass') as f: json.dump({'version': self.VERSION, 'files': self.files}, f, ensure_ascii=False)
+        os.replace(tmp, self.path); self.dirty = False
+
+def read_text_file(path: str) -> list[str]:
+    with open(path, 'r', encoding='utf-8', errors='surrogatepass') as f: return parse_text_file(f.read())
+
+def scan_text_files(lang_dir: Path, num_entries: int) -> dict:
+    """Egyetlen könyvtárbejárás NNNN.txt fájljait rendeli a bejegyzések indexeihez."""
+    files = {}
+    with os.scandir(lang_dir) as it:
+        for de in it:
+            m = TEXT_FILE.match(de.name)
+            if m and de.name == f"{int(m.group(1)):04d}.txt" and int(m.group(1)) < num_entries and de.is_file(): files[int(m.group(1))] = de
+    return files
+
+def iter_directory_translations(lang_dir: Path, num_entries: int, io_threads: int = 0, index: Optional[TextIndex] = None):
+    """Egyetlen mappabejárással talált NNNN.txt fájlok szövegeit adja vissza; igény szerint szálkészleten olvasva,
+    változatlan fájloknál a kísérő `index` indexből."""
+    files = scan_text_files(lang_dir, num_entries)
+    load = (lambda de: index.load(de.name, de.path, de.stat())) if index else (lambda de: read_text_file(de.path))
+    with (ThreadPoolExecutor(io_threads) if io_threads > 1 else nullcontext()) as pool:
+        loaded = map_entries(load, (files[i] for i in sorted(files)), pool)
+        for i in range(num_entries):
+            yield next(loaded) if i in files else []
+    if index: index.save()
+
+def iter_translations(source_path: str, num_entries: int, io_threads: int = 0, index: Optional[TextIndex] = None):
+    """Bejegyzésenként adja vissza a lefordított szövegeket, a forrást egyszerre egy bejegyzésnyit olvasva."""
     p = Path(source_path)
     if p.is_dir():
         lang_dir = p / "0000"
         if not lang_dir.is_dir(): raise FileNotFoundError(f"A '{lang_dir}' mappa nem található.")
-        all_translations = [[] for _ in range(num_entries)]
-        for i in range(num_entries):
-            fpath = lang_dir / f"{i:04d}.txt"
-            if not fpath.exists(): continue
-            with open(fpath, 'r', encoding='utf-8', errors='surrogatepass') as f: content = f.read()
-            texts = {}
-            current_idx, current_text = -1, ""
-            for line in content.splitlines():
-                if line.startswith('[') and line.endswith(']'):
-                    if current_idx != -1: texts[current_idx] = current_text.strip()
-                    try: current_idx = int(line[1:-1]); current_text = ""
-                    except ValueError: current_idx = -1
-                elif not line.startswith('#') and current_idx != -1: current_text += line + '\n'
-            if current_idx != -1: texts[current_idx] = current_text.strip()
-            if texts: all_translations[i] = [texts.get(j, "") for j in range(max(texts.keys()) + 1)]
-        return all_translations
+        yield from iter_directory_translations(lang_dir, num_entries, io_threads, index)
     elif p.is_file():
-        with open(p, encoding='utf-8', errors='surrogatepass') as f: data = json.load(f)
-        return [[t.get('translated_text') or '' for t in e.get('texts', [])] for e in (data['entries'] if isinstance(data, dict) else data)]
+        for e in iter_json_entries(source_path): yield [t.get('translated_text') or '' for t in e.get('texts', [])]
     else: raise FileNotFoundError("A megadott bemeneti forrás nem létezik.")
 
+def load_translations(source_path: str, num_entries: int) -> list[list[str]]:
+    return list(iter_translations(source_path, num_entries))
+
+class EntryCache:
+    """Kódolt bejegyzések lemezes gyorsítótára, a szövegeik hash-e szerint kulcsolva."""
+    VERSION = b'1'
+
+    def __init__(self, path: str):
+        self.path = Path(path); self.path.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+
+    @classmethod
+    def key(cls, texts: list[str]) -> str:
+        h = hashlib.blake2b(cls.VERSION, digest_size=16)
+        for t in texts:
+            b = t.encode('utf-8', 'surrogatepass'); h.update(struct.pack('<I', len(b))); h.update(b)
+        return h.hexdigest()
+
+    def get(self, texts: list[str]) -> Optional[bytes]:
+        try: data = (self.path / f"{self.key(texts)}.bin").read_bytes()
+        except FileNotFoundError: return None
+        self.hits += 1
+        return data
+
+    def put(self, texts: list[str], data: bytes) -> None:
+        fpath = self.path / f"{self.key(texts)}.bin"
+        tmp = fpath.with_name(f"{fpath.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(data); os.replace(tmp, fpath)
+
+def encode_changed(job: tuple[int, bytes, list[str], bool, bool]):
+    """False értéket ad vissza, ha a szövegek megegyeznek az eredeti bejegyzés dekódolásával, különben a kódolt bejegyzést (None, ha az `encode` ki van kapcsolva).
+    A szigorú mód kódolási hibáit a bejegyzés indexével együtt dobja."""
+    i, original, texts, encode, strict = job
+    if texts == TxtCodec.get_strings(original): return False
+    try:
+        if strict and not encode:
+            for t in texts: EscapeCodec.encode(t, strict)
+        return TxtCodec.build_entry(texts, strict) if encode else None
+    except ValueError as ex: raise ValueError(f"{i}. bejegyzés: {ex}") from ex
+
+def build_entries(narc: NARC, translations, cache: Optional[EntryCache] = None, pool=None, strict: bool = False) -> tuple[list[bytes], list[int]]:
+    """A lefordított bejegyzéseket beolvasás közben kódolja; az eredeti dekódolással egyező szövegű bejegyzések megtartják
+    az eredeti bájtjaikat. Visszaadja az új bejegyzéslistát és a módosult bejegyzések indexeit. `strict` esetén a hibás
+    escape-szekvenciák ValueError hibát okoznak."""
+    new_entries, changed, pending, total = list(narc.entries), [], deque(), 0
+
+    def jobs():
+        nonlocal total
+        for i, texts in enumerate(translations):
+            total += 1
+            if i >= len(narc.entries) or not any(texts): continue
+            hit = cache.get(texts) if cache else None
+            pending.append((i, texts, hit))
+            yield i, (narc.entries[i] if pool is None else bytes(narc.entries[i])), texts, hit is None, strict
+
+    for seconds, result in map_entries(partial(timed_call, encode_changed), jobs(), pool):
+        i, texts, hit = pending.popleft()
+        STATS.entry('encode', i, seconds, len(texts), len(result) if result else 0)
+        if result is False: continue
+        if result is None: result = hit
+        elif cache: cache.put(texts, result)
+        new_entries[i] = result; changed.append(i)
+    if total != len(narc.entries): print(f"[FIGYELEM] Bejegyzések száma eltér: forrás ({total}) vs. NARC ({len(narc.entries)}).")
+    return new_entries, changed
+
+def open_archive(narc_path: str) -> NARC:
+    """Lustán megnyit egy archívumot, mérve a beolvasási fázist."""
+    with STATS.phase('parse') as rec:
+        narc = NARC.open(narc_path, lazy=True)
+        rec['bytes'] += os.path.getsize(narc_path); rec['entries'] += len(narc.entries)
+    return narc
+
+def export_archive(narc_path: str, output_json: Optional[str] = None, output_dir: Optional[str] = None, pool=None,
+                   index: Optional[str] = None, io_threads: int = 4) -> dict:
+    """Egy archívumot exportál JSON-ba, könyvtárba és/vagy keresési indexbe; visszaadja az összesítő rekordját. Az index
+    az első export dekódolásából töltődik fel, az archívumot nem dekódolja újra."""
+    start = time.perf_counter()
+    with open_archive(narc_path) as narc, (SearchIndex(index) if index else nullcontext()) as db:
+        archive = db.begin(narc_path) if db else None
+        decoded = db.feed(archive, decode_entries(narc, pool)) if archive is not None else None
+        with STATS.phase('export'):
+            if output_json: export_to_json(narc, output_json, pool, decoded); decoded = None
+            if output_dir: export_to_directory(narc, output_dir, pool, io_threads, decoded); decoded = None
+        if decoded is not None:
+            with STATS.phase('index'): deque(decoded, maxlen=0)
+        if archive is not None: print(f"[INFO] {db.commit()} szöveg hozzáadva a(z) '{index}' keresési indexhez.")
+        elif db: print(f"[INFO] A(z) '{index}' keresési index már naprakész ehhez: {narc_path}.")
+        return {'entries': len(narc.entries), 'seconds': round(time.perf_counter() - start, 3)}
+
+def import_archive(source: str, narc_original: str, narc_output: str, cache_dir: Optional[str] = None, pool=None,
+                   io_threads: int = 0, use_index: bool = False, strict: bool = False) -> dict:
+    """Egy archívumba importálja a fordításokat, és kiírja az eredményt; az összesítő rekordját adja vissza."""
+    start = time.perf_counter()
+    with open_archive(narc_original) as narc:
+        cache = EntryCache(cache_dir) if cache_dir else None
+        index = TextIndex(Path(source) / "0000") if use_index and os.path.isdir(source) else None
+        if os.path.isfile(source): STATS.record('load')['bytes'] += os.path.getsize(source)
+        with STATS.phase('import'):
+            new_entries, changed = build_entries(narc, STATS.timed_iter('load', iter_translations(source, len(narc.entries), io_threads, index)), cache, pool, strict)
+        size = narc.write(narc_output, new_entries)
+        return {'entries': len(narc.entries), 'updated': len(changed), 'cached': cache.hits if cache else 0,
+                'unchanged': index.skipped if index else 0, 'bytes': size, 'seconds': round(time.perf_counter() - start, 3)}
+
+def patch_archive(source: str, narc_path: str, output: Optional[str] = None, cache_dir: Optional[str] = None, pool=None,
+                  strict: bool = False) -> dict:
+    """A fordításokat az archívum helyben javításával importálja (vagy a fájlrendszeren készült másolatáéval, ha az `output`
+    meg van adva), csak az első módosult bejegyzéstől kezdődő adatokat írva újra."""
+    start = time.perf_counter()
+    if output and not (os.path.exists(output) and os.path.samefile(output, narc_path)): copy_file(narc_path, output)
+    target = output or narc_path
+    with open_archive(target) as narc:
+        cache = EntryCache(cache_dir) if cache_dir else None
+        with STATS.phase('import'):
+            new_entries, changed = build_entries(narc, STATS.timed_iter('load', iter_translations(source, len(narc.entries))), cache, pool, strict)
+        written = narc.patch(target, new_entries, changed[0]) if changed else 0
+        return {'entries': len(new_entries), 'updated': len(changed), 'first': changed[0] if changed else None,
+                'written': written, 'seconds': round(time.perf_counter() - start, 3)}
+
+# ---------- Archívumok összehasonlítása ---------- #
+
+def entry_hash(data) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+def diff_archives(old_path: str, new_path: str) -> dict:
+    """Bejegyzésenként összehasonlít két archívumot: a nyers bejegyzésbájtokat közvetlenül a leképezett fájlokból hash-eli,
+    és csak az eltérő hash-ű bejegyzéseket dekódolja. Visszaadja a szövegenkénti változásokat és egy összesítést."""
+    changes, differing = [], 0
+    with open_archive(old_path) as old, open_archive(new_path) as new:
+        count = max(len(old.entries), len(new.entries))
+        for i in range(count):
+            a = old.entries[i] if i < len(old.entries) else None
+            b = new.entries[i] if i < len(new.entries) else None
+            if a is not None and b is not None:
+                with STATS.phase('hash') as rec:
+                    rec['bytes'] += len(a) + len(b); rec['entries'] += 1
+                    if len(a) == len(b) and entry_hash(a) == entry_hash(b): continue
+            differing += 1
+            with STATS.phase('decode') as rec:
+                before = TxtCodec.get_strings(a) if a is not None else []
+                after = TxtCodec.get_strings(b) if b is not None else []
+                rec['entries'] += 1; rec['strings'] += len(before) + len(after)
+            for j in range(max(len(before), len(after))):
+                if j >= len(before): changes.append({'entry_index': i, 'text_index': j, 'status': 'added', 'new': after[j]})
+                elif j >= len(after): changes.append({'entry_index': i, 'text_index': j, 'status': 'removed', 'old': before[j]})
+                elif before[j] != after[j]: changes.append({'entry_index': i, 'text_index': j, 'status': 'changed', 'old': before[j], 'new': after[j]})
+        summary = {'entries': count, 'differing_entries': differing,
+                   **{k: sum(c['status'] == k for c in changes) for k in ('added', 'removed', 'changed')}}
+    return {'old': old_path, 'new': new_path, 'summary': summary, 'changes': changes}
+
+# ---------- Keresési index ---------- #
+
+CONTROL_CODE = re.compile(r'\\xf000.\\x([0-9a-fA-F]{4})', re.S)
+CONTROL_PARAM = re.compile(r'\\x[0-9a-fA-F]{4}|.', re.S)
+TOKEN = re.compile(r'\w+')
+
+def file_hash(path: str) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(partial(f.read, 1 << 20), b''): h.update(chunk)
+    return h.hexdigest()
+
+def control_codes(text: str) -> list[tuple[int, int]]:
+    """Visszaadja egy exportált szöveg vezérlőkódjainak (parancs, paraméterszám és paraméterek) (kezdet, vég) tartományait."""
+    spans, pos = [], 0
+    while (m := CONTROL_CODE.search(text, pos)):
+        pos = m.end()
+        for _ in range(int(m.group(1), 16)):
+            if not (param := CONTROL_PARAM.match(text, pos)): break
+            pos = param.end()
+        spans.append((m.start(), pos))
+    return spans
+
+def plain_text(text: str) -> str:
+    """Visszaadja az exportált szöveget a vezérlőkódjai és escape-jei nélkül."""
+    out, pos = [], 0
+    for start, end in control_codes(text):
+        out.append(text[pos:start]); out.append(' '); pos = end
+    out.append(text[pos:])
+    return EscapeCodec.ESCAPE.sub(' ', ''.join(out))
+
+def tokenize(text: str) -> set[str]:
+    return set(TOKEN.findall(plain_text(text).casefold()))
+
+class SearchIndex:
+    """A dekódolt szövegek SQLite fordított indexe: szó -> (archívum, bejegyzés, szövegindex). Az archívumokat csak
+    a tartalmuk hash-ének változásakor indexeli újra, a lekérdezések pedig semmit sem dekódolnak."""
+    VERSION = 1
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS archives (id INTEGER PRIMARY KEY, path TEXT UNIQUE, hash TEXT, mtime_ns INTEGER, size INTEGER);
+        CREATE TABLE IF NOT EXISTS texts (archive INTEGER, entry INTEGER, text_index INTEGER, text TEXT,
+                                          PRIMARY KEY (archive, entry, text_index)) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS postings (token TEXT, archive INTEGER, entry INTEGER, text_index INTEGER,
+                                             PRIMARY KEY (token, archive, entry, text_index)) WITHOUT ROWID;
+    """
+
+    def __init__(self, path: str):
+        self.db, self.count = sqlite3.connect(path, timeout=60), 0
+        if self.db.execute("PRAGMA user_version").fetchone()[0] not in (0, self.VERSION):
+            self.db.close(); raise ValueError(f"A(z) '{path}' nem ennek a verziónak a keresési indexe.")
+        with self.db:
+            self.db.executescript(self.SCHEMA); self.db.execute(f"PRAGMA user_version = {self.VERSION}")
+
+    def close(self) -> None:
+        self.db.close()
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()
+
+    def begin(self, narc_path: str) -> Optional[int]:
+        """Elkezdi egy archívum (újra)indexelését, és törli a régi szövegeit; visszaadja az azonosítóját, vagy None-t, ha a hash-e
+        nem változott. A `commit` hívásáig semmi sem kerül véglegesítésre, így egy sikertelen export az indexet változatlanul hagyja."""
+        path, st = str(Path(narc_path).resolve()), os.stat(narc_path)
+        digest = file_hash(narc_path)
+        row = self.db.execute("SELECT id, hash FROM archives WHERE path = ?", (path,)).fetchone()
+        if row and row[1] == digest:
+            with self.db: self.db.execute("UPDATE archives SET mtime_ns = ?, size = ? WHERE id = ?", (st.st_mtime_ns, st.st_size, row[0]))
+            return None
+        self.count = 0
+        if not row: return self.db.execute("INSERT INTO archives (path, hash, mtime_ns, size) VALUES (?, ?, ?, ?)", (path, digest, st.st_mtime_ns, st.st_size)).lastrowid
+        self.db.execute("DELETE FROM texts WHERE archive = ?", (row[0],)); self.db.execute("DELETE FROM postings WHERE archive = ?", (row[0],))
+        self.db.execute("UPDATE archives SET hash = ?, mtime_ns = ?, size = ? WHERE id = ?", (digest, st.st_mtime_ns, st.st_size, row[0]))
+        return row[0]
+
+    def feed(self, archive: int, decoded):
+        """Minden dekódolt bejegyzést felvesz az indexbe, miközben továbbadja, így az index az export dekódolásából épül fel."""
+        for i, texts in enumerate(decoded):
+            self.db.executemany("INSERT INTO texts VALUES (?, ?, ?, ?)", ((archive, i, j, t) for j, t in enumerate(texts)))
+            self.db.executemany("INSERT INTO postings VALUES (?, ?, ?, ?)", ((tok, archive, i, j) for j, t in enumerate(texts) for tok in tokenize(t)))
+            self.count += len(texts)
+            yield texts
+
+    def commit(self) -> int:
+        """Véglegesíti a `begin` óta átadott szövegeket; visszaadja a számukat."""
+        self.db.commit()
+        return self.count
+
+    def stale(self) -> list[str]:
+        """Visszaadja az indexelés óta módosult vagy törölt archívumokat (csak a megváltozott mtime-ú vagy méretű fájlokat hash-eli)."""
+        out = []
+        for archive, path, digest, mtime_ns, size in self.db.execute("SELECT id, path, hash, mtime_ns, size FROM archives").fetchall():
+            try: st = os.stat(path)
+            except OSError: out.append(path); continue
+            if (st.st_mtime_ns, st.st_size) == (mtime_ns, size): continue
+            if file_hash(path) != digest: out.append(path); continue
+            with self.db: self.db.execute("UPDATE archives SET mtime_ns = ?, size = ? WHERE id = ?", (st.st_mtime_ns, st.st_size, archive))
+        return out
+
+    def search(self, query: str, limit: int = 50) -> list[tuple[str, int, int, str]]:
+        """Visszaadja a lekérdezés minden szavát tartalmazó szövegek (archívum, bejegyzés, szövegindex, szöveg) adatait."""
+        tokens = sorted(tokenize(query))
+        if not tokens: raise ValueError("A lekérdezés nem tartalmaz szavakat.")
+        match = " INTERSECT ".join(["SELECT archive, entry, text_index FROM postings WHERE token = ?"] * len(tokens))
+        return self.db.execute(f"SELECT a.path, t.entry, t.text_index, t.text FROM ({match}) m JOIN texts t USING (archive, entry, text_index) "
+                               f"JOIN archives a ON a.id = t.archive ORDER BY a.path, t.entry, t.text_index LIMIT ?", (*tokens, limit)).fetchall()
+
+# ---------- Fordítási memória ---------- #
+
+PLACEHOLDER = '\ue000'
+
+def split_codes(text: str) -> tuple[str, list[str]]:
+    """Szétbontja a szöveget a vázára (a vezérlőkódok helyén helyőrzővel) és a vezérlőkódjai listájára."""
+    out, codes, pos = [], [], 0
+    for start, end in control_codes(text):
+        out.append(text[pos:start]); out.append(PLACEHOLDER); codes.append(text[start:end]); pos = end
+    out.append(text[pos:])
+    return ''.join(out), codes
+
+def map_codes(translated: str, source: list[str], target: list[str]) -> Optional[str]:
+    """A fordítás (a `source`-ból származó) vezérlőkódjait a `target` azonos helyen álló kódjaira cseréli;
+    None-t ad vissza, ha nem feleltethetők meg egymásnak."""
+    if source == target: return translated
+    if len(source) != len(target): return None
+    out, pos, used = [], 0, set()
+    for start, end in control_codes(translated):
+        code = translated[start:end]
+        k = next((k for k, c in enumerate(source) if c == code and k not in used), None)
+        if k is None: return None
+        used.add(k); out.append(translated[pos:start]); out.append(target[k]); pos = end
+    out.append(translated[pos:])
+    return ''.join(out)
+
+class TranslationMemory:
+    """Eredeti -> fordított szövegpárok, amelyek a vázuk alapján pontosan, vagy a karakter-trigramok Jaccard-hasonlósága
+    alapján közelítőleg egyeznek. Minden szövegnek csak a legritkább trigramjait indexeli és keresi (prefixszűrés),
+    így a keresés sosem hasonlít össze a teljes memóriával."""
+    N = 3
+
+    def __init__(self, threshold: float = 0.8):
+        self.threshold, self.exact, self.records, self.postings, self.order = threshold, {}, [], None, None
+
+    @classmethod
+    def shingles(cls, skeleton: str) -> frozenset:
+        s = ' '.join(skeleton.casefold().split())
+        return frozenset(s[i:i + cls.N] for i in range(max(len(s) - cls.N + 1, 1)))
+
+    def add(self, original: str, translated: str) -> None:
+        skeleton, codes = split_codes(original)
+        if skeleton in self.exact: return
+        self.exact[skeleton] = (translated, codes)
+        self.records.append((self.shingles(skeleton), translated, codes)); self.postings = None
+
+    def prefix(self, grams: frozenset) -> list[str]:
+        """Visszaadja a halmaz legritkább trigramjait, annyit, amennyiből egy küszöb-hasonlóságú szövegnek legalább egyet
+        tartalmaznia kell. Az egyik rekordban sem szereplő trigramok kerülnek előre."""
+        rank = self.order.get
+        return sorted(grams, key=lambda g: rank(g, -1))[:len(grams) - math.ceil(self.threshold * len(grams)) + 1]
+
+    def build(self) -> None:
+        """Minden rekord prefixét indexeli, a trigramokat aszerint rangsorolva, hány rekord tartalmazza őket. Minden lista
+        trigramszám szerint rendezett, így a nem illeszkedő hosszúságú rekordokat felezéses kereséssel átugorja."""
+        counts, postings = defaultdict(int), defaultdict(list)
+        for grams, _, _ in self.records:
+            for g in grams: counts[g] += 1
+        self.order = {g: k for k, g in enumerate(sorted(counts, key=lambda g: (counts[g], g)))}
+        for rid, (grams, _, _) in enumerate(self.records):
+            for g in self.prefix(grams): postings[g].append((len(grams), rid))
+        self.postings = {}
+        for g, items in postings.items():
+            items.sort(); self.postings[g] = ([n for n, _ in items], [rid for _, rid in items])
+
+    def load(self, json_path: str) -> int:
+        """Felveszi egy exportált JSON fájl összes lefordított szövegét; a felvett párok számát adja vissza."""
+        count = len(self.exact)
+        for e in iter_json_entries(json_path):
+            for t in e.get('texts', []):
+                original, translated = t.get('original_text') or '', t.get('translated_text') or ''
+                if original and translated and translated != original: self.add(original, translated)
+        return len(self.exact) - count
+
+    def match(self, original: str) -> Optional[tuple[str, float]]:
+        """Visszaadja a legjobb találat fordítását (az `original` vezérlőkódjaival) és a hasonlóságát, ha van ilyen."""
+        skeleton, codes = split_codes(original)
+        if skeleton in self.exact:
+            translated = map_codes(*self.exact[skeleton], codes)
+            if translated is not None: return translated, 1.0
+        if self.postings is None: self.build()
+        grams = self.shingles(skeleton)
+        t, size = self.threshold, len(grams)
+        best, best_score, candidates = None, t, set()
+        for g in self.prefix(grams):
+            if g not in self.postings: continue
+            sizes, rids = self.postings[g]
+            candidates.update(rids[bisect_left(sizes, t * size):bisect_right(sizes, size / t)])
+        for rid in sorted(candidates):
+            other, translated, source = self.records[rid]
+            common = len(grams & other)
+            score = common / (size + len(other) - common)
+            if score > best_score or best is None and score >= best_score:
+                mapped = map_codes(translated, source, codes)
+                if mapped is not None: best, best_score = (rid, mapped), score
+        return (best[1], best_score) if best else None
+
+def prefill_json(input_json: str, memory: TranslationMemory, output_json: str) -> dict:
+    """Kitölti egy exportált JSON fájl lefordítatlan szövegeit a fordítási memóriából; a hasonló (nem pontos) találatok
+    'similarity' mezőt kapnak, hogy átnézhetők legyenek."""
+    counts = {'exact': 0, 'similar': 0, 'untranslated': 0}
+
+    def entries():
+        for e in iter_json_entries(input_json):
+            for t in e.get('texts', []):
+                original = t.get('original_text') or ''
+                if not original or (t.get('translated_text') or original) != original: continue
+                found = memory.match(original)
+                if not found: counts['untranslated'] += 1; continue
+                t['translated_text'], score = found
+                if score < 1.0: t['similarity'] = round(score, 3); counts['similar'] += 1
+                else: counts['exact'] += 1
+            yield e
+    write_json_entries(output_json, entries())
+    return counts
+
+# ---------- Figyelő mód ---------- #
+
+class WatchSession:
+    """Memóriában tartja az eredeti archívumot és a dekódolt szövegeit, és a fordítások minden változásakor újraépíti a kimenetet."""
+
+    def __init__(self, source: str, narc_path: str, output: str):
+        if os.path.exists(output) and os.path.samefile(output, narc_path): raise ValueError("A kimenet nem írhatja felül az eredeti NARC fájlt.")
+        self.source, self.output, self.is_dir = source, output, os.path.isdir(source)
+        self.lang_dir = Path(source) / "0000"
+        if self.is_dir and not self.lang_dir.is_dir(): raise FileNotFoundError(f"The '{self.lang_dir}' directory was not found.")
+        with open_archive(narc_path) as narc:
+            self.original = [bytes(e) for e in narc.entries]
+        self.narc = NARC()
+        with STATS.phase('decode'): self.strings = [TxtCodec.get_strings(e) for e in self.original]
+        self.entries, self.texts, self.stamps = list(self.original), [[] for _ in self.original], None
+
+    def stamp(self) -> dict:
+        """Visszaadja minden figyelt fájl (mtime, méret) párját a bejegyzés indexe szerint (JSON forrásnál -1)."""
+        if not self.is_dir:
+            st = os.stat(self.source); return {-1: (st.st_mtime_ns, st.st_size)}
+        return {i: (st.st_mtime_ns, st.st_size) for i, st in ((i, de.stat()) for i, de in scan_text_files(self.lang_dir, len(self.original)).items())}
+
+    def read(self, stamps: dict) -> dict:
+        """Beolvassa a legutóbbi ellenőrzés óta megváltozott fájlok szövegeit; a törölt fájlok, illetve a JSON forrás végéről
+        hiányzó bejegyzések helyett az eredeti marad."""
+        if not self.is_dir:
+            texts = list(iter_translations(self.source, len(self.original)))
+            return dict(enumerate(texts + [[] for _ in range(len(self.original) - len(texts))]))
+        old = self.stamps or {}
+        changed = {i for i in stamps.keys() | old.keys() if stamps.get(i) != old.get(i)}
+        return {i: read_text_file(str(self.lang_dir / f"{i:04d}.txt")) if i in stamps else [] for i in changed}
+
+    def poll(self) -> Optional[list[int]]:
+        """Újrakódolja a megváltozott szövegű bejegyzéseket és újraírja a kimenetet (az első ellenőrzéskor mindig);
+        visszaadja az indexeiket (None, ha a kimenet változatlan maradt)."""
+        stamps, first = self.stamp(), self.stamps is None
+        if stamps == self.stamps: return None
+        updated = []
+        for i, texts in self.read(stamps).items():
+            if i >= len(self.original) or texts == self.texts[i]: continue
+            self.texts[i] = texts
+            entry = self.original[i] if not any(texts) or texts == self.strings[i] else TxtCodec.build_entry(texts)
+            if entry is not self.entries[i]: self.entries[i] = entry; updated.append(i)
+        self.stamps = stamps
+        if not updated and not first: return None
+        self.narc.write(self.output, self.entries)
+        return sorted(updated)
+
+    def run(self, interval: float) -> None:
+        """Megszakításig `interval` másodpercenként ellenőrzi a forrást."""
+        print(f"[INFO] '{self.source}' figyelése (leállítás: Ctrl+C).")
+        while True:
+            start = time.perf_counter()
+            try: updated = self.poll()
+            except (OSError, ValueError) as ex: print(f"[FIGYELEM] A fordítások nem olvashatók, újrapróbálás: {ex}")
+            else:
+                if updated is not None: print(f"[INFO] {len(updated)} bejegyzés újrakódolva {(time.perf_counter() - start) * 1000:.1f} ms alatt: {self.output}")
+            time.sleep(interval)
+
+# ---------- Szerver mód ---------- #
+
+class Workspace:
+    """Egy hosszan futó szerver egyszer betöltött archívumai: a legutóbb dekódolt bejegyzések és a függő módosítások a kérések között a memóriában maradnak."""
+
+    def __init__(self, narc_paths: list[str]):
+        self.archives, self.lock = {}, threading.Lock()
+        for path in narc_paths:
+            name = Path(path).stem
+            if name in self.archives: raise ValueError(f"Két archívum neve is '{name}'.")
+            narc = open_archive(path)
+            self.archives[name] = {'path': path, 'narc': narc, 'edits': {}}
+
+    def close(self) -> None:
+        for a in self.archives.values(): a['narc'].close()
+
+    def archive(self, req: dict) -> dict:
+        name = req.get('archive')
+        if name is None and len(self.archives) == 1: name = next(iter(self.archives))
+        if name not in self.archives: raise ValueError(f"Ismeretlen archívum: {name}")
+        return self.archives[name]
+
+    @staticmethod
+    def strings(a: dict, i: int) -> list[str]:
+        """Visszaadja az `i`. bejegyzés eredeti szövegeit az archívum dekódolt bejegyzéseinek korlátos gyorsítótárából."""
+        n = len(a['narc'].entries)
+        if not 0 <= i < n: raise IndexError(f"Entry {i} is out of range (0-{n - 1}).")
+        return a['narc'].strings(i)
+
+    @staticmethod
+    def integer(req: dict, field: str) -> int:
+        """Egy kérés egész számú mezőjét adja vissza; a tört számot, logikai értéket és szöveget elutasítja."""
+        v = req[field]
+        if not isinstance(v, int) or isinstance(v, bool): raise ValueError(f"A '{field}' mezőnek egész számnak kell lennie.")
+        return v
+
+    def texts(self, a: dict, i: int) -> list[str]:
+        """Visszaadja az `i`. bejegyzés aktuális (módosított vagy eredeti) szövegeit."""
+        return a['edits'][i][0] if i in a['edits'] else self.strings(a, i)
+
+    def entries(self, a: dict) -> list[bytes]:
+        """Visszaadja a bejegyzések listáját a módosításokkal, minden módosítást egyszer kódolva."""
+        entries = list(a['narc'].entries)
+        for i, (texts, data) in a['edits'].items():
+            if data is None: data = a['edits'][i][1] = TxtCodec.build_entry(texts)
+            entries[i] = data
+        return entries
+
+    def handle(self, req: dict) -> dict:
+        """Végrehajt egy kérést ({'op': 'list' | 'get' | 'set' | 'rebuild' | 'export', ...}) és visszaadja a választ."""
+        op = req.get('op')
+        with self.lock:
+            if op == 'list':
+                return {'archives': [{'archive': k, 'path': a['path'], 'entries': len(a['narc'].entries), 'edited': sorted(a['edits'])} for k, a in self.archives.items()]}
+            a = self.archive(req)
+            if op == 'get':
+                return {'texts': list(self.texts(a, self.integer(req, 'entry')))}
+            if op == 'set':
+                i = self.integer(req, 'entry'); texts = list(self.texts(a, i))
+                if 'texts' in req:
+                    if not isinstance(req['texts'], list) or not all(isinstance(t, str) for t in req['texts']): raise ValueError("A 'texts' mezőnek szövegek listájának kell lennie.")
+                    texts = list(req['texts'])
+                else:
+                    j = self.integer(req, 'text_index')
+                    if not 0 <= j < len(texts): raise IndexError(f"A(z) {j}. szöveg a tartományon kívül esik (0-{len(texts) - 1}).")
+                    if not isinstance(req['text'], str): raise ValueError("A 'text' mezőnek szövegnek kell lennie.")
+                    texts[j] = req['text']
+                if texts == self.strings(a, i): a['edits'].pop(i, None)
+                else: a['edits'][i] = [texts, None]
+                return {'texts': texts}
+            if op == 'rebuild':
+                if not req.get('output'): raise ValueError("Az 'output' mező kötelező.")
+                if os.path.exists(req['output']) and os.path.samefile(req['output'], a['path']): raise ValueError("A kimenet nem írhatja felül az eredeti NARC fájlt.")
+                return {'output': req['output'], 'updated': len(a['edits']), 'bytes': a['narc'].write(req['output'], self.entries(a))}
+            if op == 'export':
+                if not req.get('output_json') and not req.get('output_dir'): raise ValueError("Legalább egy kimenetet meg kell adni (output_json vagy output_dir).")
+                n = len(a['narc'].entries)
+                if req.get('output_json'):
+                    write_json_entries(req['output_json'], ({'entry_index': i, 'texts': [{'text_index': j, 'original_text': o, 'translated_text': t} for j, (o, t) in enumerate(zip_longest(self.strings(a, i), self.texts(a, i), fillvalue=''))]} for i in range(n)))
+                if req.get('output_dir'): write_text_directory(req['output_dir'], (self.texts(a, i) for i in range(n)))
+                return {'entries': n}
+            raise ValueError(f"Ismeretlen művelet: {op}")
+
+    def respond(self, body: bytes) -> tuple[int, bytes]:
+        """Dekódolja a JSON kérést és kódolja a választ; a hibákból {'ok': false, 'error': ...} lesz."""
+        try:
+            req = json.loads(body)
+            if not isinstance(req, dict): raise ValueError("A kérésnek JSON objektumnak kell lennie.")
+            status, res = 200, {'ok': True, **self.handle(req)}
+        except (KeyError, IndexError, ValueError, TypeError, OSError) as ex:
+            status, res = 400, {'ok': False, 'error': f"Hiányzó mező: {ex}" if isinstance(ex, KeyError) else str(ex)}
+        return status, json.dumps(res).encode('ascii')
+
+class HTTPHandler(BaseHTTPRequestHandler):
+    """POST / JSON kéréstörzzsel; a válasz egy JSON objektum. Csak a localhostnak címzett application/json kéréseket
+    szolgálja ki, így a böngészőben megnyitott weboldalak nem érhetik el a szervert (ehhez CORS előkérés kellene)."""
+    workspace: Workspace = None
+    LOCAL_HOSTS = ('localhost', '127.0.0.1')
+
+    def rejection(self) -> Optional[tuple[int, str]]:
+        """Egy ki nem szolgálható kérés állapotkódját és hibaüzenetét adja vissza, különben None-t."""
+        if (self.headers.get('Content-Type') or '').split(';')[0].strip().lower() != 'application/json':
+            return 415, "A kérés Content-Type fejlécének application/json értékűnek kell lennie."
+        origin = self.headers.get('Origin')
+        if urlsplit('//' + (self.headers.get('Host') or '')).hostname not in self.LOCAL_HOSTS or (origin is not None and urlsplit(origin).hostname not in self.LOCAL_HOSTS):
+            return 403, "Csak a localhostról érkező kérések fogadhatók el."
+        length = self.headers.get('Content-Length')
+        if length is None: return 411, "A kérésnek Content-Length fejléccel kell rendelkeznie."
+        if not length.strip().isdecimal(): return 400, "A Content-Length fejléc érvénytelen."
+        return None
+
+    def do_POST(self):
+        rejected = self.rejection()
+        if rejected: status, data = rejected[0], json.dumps({'ok': False, 'error': rejected[1]}).encode('ascii')
+        else: status, data = self.workspace.respond(self.rfile.read(int(self.headers['Content-Length'])))
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json'); self.send_header('Content-Length', str(len(data)))
+        self.end_headers(); self.wfile.write(data)
+
+    def log_message(self, format, *args): pass
+
+class SocketHandler(socketserver.StreamRequestHandler):
+    """Soronként egy JSON kérés; mindegyikre egy JSON sor a válasz."""
+    workspace: Workspace = None
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip(): continue
+            self.wfile.write(self.workspace.respond(line)[1] + b'\n'); self.wfile.flush()
+
+def serve(workspace: Workspace, port: int = 8765, socket_path: Optional[str] = None) -> None:
+    """Megszakításig kiszolgálja a munkaterületet Unix socketen vagy a localhost HTTP-n."""
+    if socket_path:
+        if not hasattr(socket, 'AF_UNIX'): raise ValueError("Ezen a rendszeren a Unix socketek nem támogatottak.")
+        if os.path.lexists(socket_path):
+            if not stat.S_ISSOCK(os.lstat(socket_path).st_mode): raise ValueError(f"A(z) '{socket_path}' már létezik, és nem socket.")
+            os.unlink(socket_path)
+        server = socketserver.ThreadingUnixStreamServer(socket_path, type('Handler', (SocketHandler,), {'workspace': workspace}))
+        where = socket_path
+    else:
+        server = ThreadingHTTPServer(('127.0.0.1', port), type('Handler', (HTTPHandler,), {'workspace': workspace}))
+        where = f"http://127.0.0.1:{server.server_address[1]}/"
+    server.daemon_threads = True
+    print(f"[INFO] {len(workspace.archives)} archívum kiszolgálása itt: {where} (leállítás: Ctrl+C).", flush=True)
+    try: server.serve_forever()
+    finally:
+        server.server_close()
+        if socket_path and os.path.lexists(socket_path) and stat.S_ISSOCK(os.lstat(socket_path).st_mode): os.unlink(socket_path)
+
+# ---------- Kötegelt feldolgozás ---------- #
+
+def find_archives(source: str) -> list[tuple[Path, str]]:
+    """Felsorolja egy mappa (rekurzívan) vagy egy listafájl (soronként egy útvonal, '#' megjegyzések) NARC fájljait,
+    a kimenetükhöz használt névvel (a közös mappájukhoz viszonyított útvonal, kiterjesztés nélkül) együtt."""
+    p = Path(source)
+    if p.is_dir():
+        return [(f, f.relative_to(p).with_suffix('').as_posix()) for f in sorted(p.rglob('*')) if f.is_file() and f.suffix.lower() == '.narc']
+    if not p.is_file(): raise FileNotFoundError("A megadott bemeneti forrás nem létezik.")
+    files = [p.parent / line.strip() for line in p.read_text(encoding='utf-8').splitlines() if line.strip() and not line.lstrip().startswith('#')]
+    if not files: return []
+    base = Path(os.path.commonpath([f.resolve().parent for f in files]))
+    return [(f, f.resolve().relative_to(base).with_suffix('').as_posix()) for f in files]
+
+def batch_task(task: tuple) -> dict:
+    """A köteg egy archívumát dolgozza fel; a hibákat hibarekorddá alakítja."""
+    fn, args = task
+    try: return {'status': 'ok', **fn(*args)}
+    except Exception as ex: return {'status': 'error', 'error': str(ex)}
+
+def run_batch(command: str, tasks: list[tuple], output_dir: str, jobs: int) -> int:
+    """A (record, fn, args) feladatokat egy közös folyamatkészleten futtatja, és kiírja a summary.json fájlt; a hibák számát adja vissza."""
+    records = []
+    with worker_pool(jobs) as pool:
+        pending = [pool.submit(batch_task, (fn, args)) if pool else (fn, args) for _, fn, args in tasks]
+        for (record, _, _), job in zip(tasks, pending):
+            result = job.result() if pool else batch_task(job)
+            records.append({**record, **result})
+            if result['status'] == 'ok': print(f"[INFO] {record['narc']}: {result['entries']} bejegyzés feldolgozva {result['seconds']} mp alatt.")
+            else: print(f"[HIBA] {record['narc']}: {result['error']}", file=sys.stderr)
+    failed = sum(r['status'] != 'ok' for r in records)
+    summary = Path(output_dir) / 'summary.json'
+    with open(summary, 'w', encoding='utf-8') as f:
+        json.dump({'command': command, 'archives': records, 'failed': failed}, f, ensure_ascii=False, indent=2)
+    print(f"[SIKER] {len(records)} archívumból {len(records) - failed} feldolgozva. Összesítő: {summary}")
+    return failed
+
+# ---------- Teljesítménymérés ---------- #
+
+BENCH_SHAPES = {
+    'small':   {'entries': 200, 'strings': 20, 'length': 40, 'control': 0.05},
+    'wide':    {'entries': 20, 'strings': 400, 'length': 40, 'control': 0.05},
+    'long':    {'entries': 50, 'strings': 8, 'length': 1000, 'control': 0.02},
+    'control': {'entries': 200, 'strings': 20, 'length': 40, 'control': 0.5},
+}
+BENCH_CONTROLS = ['\\xfffe', '\\xf000', '\\x0000', '\\x0001', '\\xfffe', '\\x0000']
+
+def synthetic_texts(rng, strings: int, length: int, control: float) -> list[str]:
+    """Véletlen szövegek nagyjából `length` kódegységgel; ezek `control` hányada \\xNNNN vezérlőkód."""
+    letters = 'abcdefghijklmnopqrstuvwxyz ABCDEFGHIJKLMNOPQRSTUVWXYZ.,!?éáő'
+    return [''.join(rng.choice(BENCH_CONTROLS) if rng.random() < control else rng.choice(letters) for _ in range(rng.randint(length // 2, length * 3 // 2))) for _ in range(strings)]
+
+def synthetic_narc(fn: str, entries: int, strings: int, length: int, control: float, seed: int = 0) -> list[list[str]]:
+    """Szintetikus NARC fájlt ír a TxtCodec.build_entry és a NARC.write segítségével; a szövegeit adja vissza."""
+    rng = Random(seed)
+    texts = [synthetic_texts(rng, strings, length, control) for _ in range(entries)]
+    NARC().write(fn, [TxtCodec.build_entry(t) for t in texts])
+    return texts
+
+def bench_shape(shape: dict, repeat: int) -> dict:
+    """Minden fázist megmér egy szintetikus archívumon: legjobb futási idő, átviteli sebesség és mért memóriacsúcs."""
+    with tempfile.TemporaryDirectory() as tmp:
+        src, blank, out = (os.path.join(tmp, n) for n in ('bench.narc', 'blank.narc', 'out.narc'))
+        texts = synthetic_narc(src, **shape)
+        NARC().write(blank, [b''] * len(texts))
+        size, count = os.path.getsize(src), sum(len(t) for t in texts)
+        narc = NARC.open(src)
+        encoded = list(narc.entries)
+        phases = {
+            'open': lambda: NARC.open(src),
+            'get_strings': lambda: [TxtCodec.get_strings(e) for e in encoded],
+            'build_entry': lambda: [TxtCodec.build_entry(t) for t in texts],
+            'rebuild': lambda: narc.rebuild(encoded),
+            'write': lambda: narc.write(out, encoded),
+            'export_json': lambda: export_to_json(narc, os.path.join(tmp, 'texts.json')),
+            'import_json': lambda: import_archive(os.path.join(tmp, 'texts.json'), blank, out),
+            'export_dir': lambda: (shutil.rmtree(os.path.join(tmp, 'texts'), ignore_errors=True), export_to_directory(narc, os.path.join(tmp, 'texts'))),
+            'reexport_dir': lambda: export_to_directory(narc, os.path.join(tmp, 'texts')),
+            'import_dir': lambda: import_archive(os.path.join(tmp, 'texts'), blank, out),
+        }
+        results = {}
+        with redirect_stdout(io.StringIO()):
+            for name, fn in phases.items():
+                best = float('inf')
+                for _ in range(repeat):
+                    start = time.perf_counter(); fn(); best = min(best, time.perf_counter() - start)
+                tracemalloc.start()
+                fn()
+                peak = tracemalloc.get_traced_memory()[1]; tracemalloc.stop()
+                results[name] = {'seconds': round(best, 6), 'strings_per_s': round(count / best), 'mb_per_s': round(size / best / 1e6, 2), 'peak_kb': peak // 1024}
+        return {'shape': shape, 'bytes': size, 'strings': count, 'phases': results}
+
+def bench_corpus(json_path: str, repeat: int) -> dict:
+    """Az escape-motort a referencia-feldolgozóval és -dekódolóval méri egy exportált JSON fájl szövegein,
+    miután ellenőrizte, hogy ugyanazt az eredményt adják."""
+    texts = [t.get('original_text') or '' for e in iter_json_entries(json_path) for t in e.get('texts', [])]
+    codes = [TxtCodec.txt_to_codes(t) for t in texts]
+    units = [array('H', c) for c in codes]
+    if [list(EscapeCodec.encode(t)) for t in texts] != codes or [EscapeCodec.decode(u) for u in units] != [TxtCodec.codes_to_txt(u) for u in units]:
+        raise ValueError("Az escape-motor eredménye ezen a korpuszon eltér a referenciafüggvényekétől.")
+    phases = {
+        'encode_reference': lambda: [TxtCodec.txt_to_codes(t) for t in texts],
+        'encode': lambda: [EscapeCodec.encode(t) for t in texts],
+        'encode_strict': lambda: [EscapeCodec.encode(t, True) for t in texts],
+        'decode_reference': lambda: [TxtCodec.codes_to_txt(u) for u in units],
+        'decode': lambda: [EscapeCodec.decode(u) for u in units],
+    }
+    results, size = {}, sum(len(u) for u in units) * 2
+    for name, fn in phases.items():
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter(); fn(); best = min(best, time.perf_counter() - start)
+        results[name] = {'seconds': round(best, 6), 'strings_per_s': round(len(texts) / best), 'mb_per_s': round(size / best / 1e6, 2)}
+    return {'corpus': json_path, 'strings': len(texts), 'bytes': size, 'phases': results}
+
+def compare_bench(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Felsorolja azokat a (mintákhoz és a korpuszhoz tartozó) fázisokat, amelyek a `threshold` aránynál jobban lassultak az alapértékhez képest."""
+    runs = []
+    for shape, res in results['shapes'].items():
+        old = baseline.get('shapes', {}).get(shape)
+        if old and old.get('shape') == res['shape']: runs.append((shape, res, old))
+    res, old = results.get('corpus'), baseline.get('corpus')
+    if res and old and (old.get('strings'), old.get('bytes')) == (res['strings'], res['bytes']): runs.append(('corpus', res, old))
+    regressions = []
+    for name, res, old in runs:
+        for phase, m in res['phases'].items():
+            was = old['phases'].get(phase, {}).get('seconds')
+            if was and m['seconds'] > was * (1 + threshold): regressions.append(f"{name}/{phase}: {was:.4f} s -> {m['seconds']:.4f} s (+{(m['seconds'] / was - 1) * 100:.0f}%)")
+    return regressions
+
+def run_bench(shapes: dict, repeat: int, output: Optional[str], baseline: Optional[str], threshold: float, corpus: Optional[str] = None) -> int:
+    """Lefuttatja a teljesítménymérést, táblázatot ír ki, elmenti az eredményeket és összeveti őket az alapértékkel; a visszaesések számát adja vissza."""
+    results = {'python': sys.version.split()[0], 'platform': sys.platform, 'date': time.strftime('%Y-%m-%d %H:%M:%S'), 'shapes': {}}
+    for name, shape in shapes.items():
+        res = results['shapes'][name] = bench_shape(shape, repeat)
+        print(f"[MÉRÉS] {name}: {shape['entries']} bejegyzés x {shape['strings']} szöveg, {res['bytes'] / 1e6:.2f} MB")
+        for phase, m in res['phases'].items():
+            print(f"    {phase:<12} {m['seconds'] * 1000:9.2f} ms {m['strings_per_s']:>11} szöveg/s {m['mb_per_s']:>9.2f} MB/s {m['peak_kb']:>9} KiB csúcs")
+    if corpus:
+        res = results['corpus'] = bench_corpus(corpus, repeat)
+        print(f"[MÉRÉS] {corpus}: {res['strings']} szöveg, {res['bytes'] / 1e6:.2f} MB kódegység")
+        for phase, m in res['phases'].items():
+            print(f"    {phase:<16} {m['seconds'] * 1000:9.2f} ms {m['strings_per_s']:>11} szöveg/s {m['mb_per_s']:>9.2f} MB/s")
+    if output:
+        with open(output, 'w', encoding='utf-8') as f: json.dump(results, f, indent=2)
+        print(f"[SIKER] Mérési eredmények elmentve: {output}")
+    if not baseline: return 0
+    with open(baseline, encoding='utf-8') as f: regressions = compare_bench(results, json.load(f), threshold)
+    for line in regressions: print(f"[VISSZAESÉS] {line}")
+    if not regressions: print(f"[SIKER] Nincs visszaesés a(z) {baseline} alapértékhez képest.")
+    return len(regressions)
+
 # ---------- Önellenőrzés és Főprogram ---------- #
 
 def selftest():
@@ -198,48 +1421,207 @@ def selftest():
     entry = TxtCodec.build_entry([s])
     decrypted = TxtCodec.get_strings(entry)
     assert len(decrypted) == 1 and decrypted[0] == s, 'Önteszt sikertelen!'
+    k, ref = TxtCodec.INIT_KEY, []
+    for c in reversed(TxtCodec.txt_to_codes(s) + [0xFFFF]): ref.append(c ^ k); k = TxtCodec.rotate(k)
+    assert entry.endswith(struct.pack(f'<{len(ref)}H', *reversed(ref))), 'Önteszt sikertelen!'
+    t = 'Aé\\xf000\\x0001\\x0000Ő\\xfffe\\x12'
+    units = EscapeCodec.encode(t)
+    assert list(units) == TxtCodec.txt_to_codes(t) and EscapeCodec.decode(units) == TxtCodec.codes_to_txt(units) == t, 'Önteszt sikertelen!'
     print('[ÖNTESZT] Kódolási/dekódolási algoritmus helyes.')
 
 def main():
     parser = argparse.ArgumentParser(description='Pokémon B/W NARC szövegkezelő eszköz (Export/Import)', formatter_class=argparse.RawTextHelpFormatter)
     subparsers = parser.add_subparsers(dest='command', help='Elérhető parancsok')
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--stats', action='store_true', help='Fázisonkénti idők, méretek és a leglassabb bejegyzések kiírása.')
+    common.add_argument('--stats-json', metavar='FILE', help='A fázisok mérőszámainak mentése ebbe a JSON fájlba.')
+    common.add_argument('--profile', metavar='FILE', help='A futás cProfile kimenetének mentése ebbe a fájlba.')
 
-    p_export = subparsers.add_parser('export', help='Szövegek exportálása NARC fájlból.', epilog="Példák:\n  python %(prog)s export a003.narc -o szovegek.json\n  python %(prog)s export a003.narc -d forditando_szovegek")
+    p_export = subparsers.add_parser('export', parents=[common], help='Szövegek exportálása NARC fájlból.', epilog="Példák:\n  python %(prog)s export a003.narc -o szovegek.json\n  python %(prog)s export a003.narc -d forditando_szovegek")
     p_export.add_argument('input_narc', help='A bemeneti NARC fájl.')
     p_export.add_argument('-o', '--output-json', help='A kimeneti JSON fájl neve.')
     p_export.add_argument('-d', '--output-dir', help='Kimeneti mappa .txt fájlokhoz.')
+    p_export.add_argument('-j', '--jobs', type=int, default=1, help='Munkafolyamatok száma (0 = CPU-magonként egy).')
+    p_export.add_argument('--io-threads', type=int, default=4, help='A könyvtárba exportált .txt fájlok írása ennyi szálon (alapértelmezett: 4).')
+    p_export.add_argument('--index', metavar='DB', help='A szövegek hozzáadása ehhez a keresési indexhez (lásd a search parancsot).')
+
+    p_show = subparsers.add_parser('show', parents=[common], help='Egyetlen bejegyzés szövegeinek kiírása.', epilog="Példák:\n  python %(prog)s show a003.narc 12\n  python %(prog)s show a003.narc 12 -t 3")
+    p_show.add_argument('input_narc', help='A bemeneti NARC fájl.')
+    p_show.add_argument('entry', type=int, help='A bejegyzés sorszáma.')
+    p_show.add_argument('-t', '--text', type=int, help='Csak ennek a szövegnek a kiírása (sorszám).')
 
-    p_import = subparsers.add_parser('import', help='Szövegek visszaimportálása NARC fájlba.', epilog="Példák:\n  python %(prog)s import szovegek.json a003.narc uj.narc\n  python %(prog)s import forditott_szovegek/ a003.narc uj.narc")
+    p_import = subparsers.add_parser('import', parents=[common], help='Szövegek visszaimportálása NARC fájlba.', epilog="Példák:\n  python %(prog)s import szovegek.json a003.narc uj.narc\n  python %(prog)s import forditott_szovegek/ a003.narc uj.narc")
     p_import.add_argument('input_source', help='Bemeneti forrás (JSON fájl vagy mappa).')
     p_import.add_argument('narc_original', help='Az eredeti NARC fájl.')
     p_import.add_argument('narc_output', help='A kimeneti, új NARC fájl neve.')
+    p_import.add_argument('--cache-dir', help='Mappa a kódolt bejegyzések importálások közötti gyorsítótárazásához.')
+    p_import.add_argument('-j', '--jobs', type=int, default=1, help='Munkafolyamatok száma (0 = CPU-magonként egy).')
+    p_import.add_argument('--io-threads', type=int, default=0, help='A mappaforrás .txt fájljainak olvasása ennyi szálon.')
+    p_import.add_argument('--index', action='store_true', help='Kísérő index vezetése a mappaforrásban; a legutóbbi importálás óta változatlan fájlok kihagyása.')
+    p_import.add_argument('--strict', action='store_true', help='Leállás hibás \\xNNNN escape-szekvenciánál ahelyett, hogy szövegként megtartaná.')
     
+    p_patch = subparsers.add_parser('patch', parents=[common], help='Szövegek importálása a NARC fájl helyben javításával.', epilog="Példák:\n  python %(prog)s patch szovegek.json a003.narc\n  python %(prog)s patch forditott_szovegek/ a003.narc -o uj.narc")
+    p_patch.add_argument('input_source', help='Bemeneti forrás (JSON fájl vagy mappa).')
+    p_patch.add_argument('narc', help='A javítandó NARC fájl.')
+    p_patch.add_argument('-o', '--output', help='Az eredeti fájl helyett egy ilyen nevű másolat javítása.')
+    p_patch.add_argument('--cache-dir', help='Mappa a kódolt bejegyzések importálások közötti gyorsítótárazásához.')
+    p_patch.add_argument('-j', '--jobs', type=int, default=1, help='Munkafolyamatok száma (0 = CPU-magonként egy).')
+    p_patch.add_argument('--strict', action='store_true', help='Leállás hibás \\xNNNN escape-szekvenciánál ahelyett, hogy szövegként megtartaná.')
+
+    p_export_batch = subparsers.add_parser('export-batch', parents=[common], help='Egy mappa vagy listafájl összes NARC fájljának exportálása egyetlen futással.', epilog="Példák:\n  python %(prog)s export-batch narcok/ exportalt/\n  python %(prog)s export-batch archivumok.txt exportalt/ -f dir -j 0")
+    p_export_batch.add_argument('input', help='NARC fájlokat tartalmazó mappa (rekurzív keresés) vagy listafájl soronként egy NARC fájllal.')
+    p_export_batch.add_argument('output_dir', help='Kimeneti mappa; ide kerül a summary.json is.')
+    p_export_batch.add_argument('-f', '--format', choices=['json', 'dir'], default='json', help='Archívumonként JSON fájl vagy .txt fájlokat tartalmazó mappa.')
+    p_export_batch.add_argument('-j', '--jobs', type=int, default=0, help='Munkafolyamatok száma (0 = CPU-magonként egy).')
+    p_export_batch.add_argument('--index', metavar='DB', help='Minden archívum szövegeinek hozzáadása ehhez a keresési indexhez.')
+
+    p_diff = subparsers.add_parser('diff', parents=[common], help='Két NARC fájl eltérő szövegeinek megjelenítése.', epilog="Példák:\n  python %(prog)s diff regi_a003.narc a003.narc\n  python %(prog)s diff regi_a003.narc a003.narc --json valtozasok.json")
+    p_diff.add_argument('old_narc', help='A régebbi NARC fájl.')
+    p_diff.add_argument('new_narc', help='Az újabb NARC fájl.')
+    p_diff.add_argument('--json', metavar='FILE', help='Az eltérések mentése ebbe a JSON fájlba is.')
+
+    p_search = subparsers.add_parser('search', parents=[common], help='Szövegek keresése egy keresési index archívumaiban.', epilog="Példák:\n  python %(prog)s search szovegek.db humble maid\n  python %(prog)s search szovegek.db \"big heart\" -n 10")
+    p_search.add_argument('index', help='Az export --index paranccsal készített keresési index.')
+    p_search.add_argument('query', nargs='+', help='A szövegben mind előforduló szavak (kis- és nagybetű nem számít).')
+    p_search.add_argument('-n', '--limit', type=int, default=50, help='A találatok legnagyobb száma (alapértelmezett: 50).')
+    p_search.add_argument('--json', metavar='FILE', help='A találatok mentése ebbe a JSON fájlba is.')
+
+    p_import_batch = subparsers.add_parser('import-batch', parents=[common], help='Fordítások importálása egy mappa vagy listafájl összes NARC fájljába egyetlen futással.', epilog="Példák:\n  python %(prog)s import-batch exportalt/ narcok/ uj_narcok/\n  python %(prog)s import-batch exportalt/ archivumok.txt uj_narcok/ --cache-dir gyorsitotar")
+    p_import_batch.add_argument('input_source', help='Mappa, amely archívumonként egy <név>.json vagy <név>/ fordítási forrást tartalmaz.')
+    p_import_batch.add_argument('narc_input', help='Az eredeti NARC fájlok mappája vagy listafájl soronként egy NARC fájllal.')
+    p_import_batch.add_argument('output_dir', help='Kimeneti mappa az új NARC fájloknak és a summary.json fájlnak.')
+    p_import_batch.add_argument('--cache-dir', help='Mappa a kódolt bejegyzések importálások közötti gyorsítótárazásához.')
+    p_import_batch.add_argument('-j', '--jobs', type=int, default=0, help='Munkafolyamatok száma (0 = CPU-magonként egy).')
+
+    p_watch = subparsers.add_parser('watch', parents=[common], help='NARC fájl újraépítése a fordítások minden változásakor.', epilog="Példák:\n  python %(prog)s watch forditott_szovegek/ a003.narc uj.narc\n  python %(prog)s watch szovegek.json a003.narc uj.narc -i 0.2")
+    p_watch.add_argument('input_source', help='Bemeneti forrás (JSON fájl vagy mappa).')
+    p_watch.add_argument('narc_original', help='Az eredeti NARC fájl.')
+    p_watch.add_argument('narc_output', help='A naprakészen tartandó NARC fájl.')
+    p_watch.add_argument('-i', '--interval', type=float, default=0.5, help='Két ellenőrzés között eltelt másodpercek (alapértelmezett: 0.5).')
+
+    p_prefill = subparsers.add_parser('prefill', parents=[common], help='Lefordítatlan szövegek kitöltése korábbi fordításokból.', epilog="Példák:\n  python %(prog)s prefill uj_szovegek.json regi_szovegek.json -o kitoltott.json\n  python %(prog)s prefill uj_szovegek.json a002.json a003.json -o kitoltott.json -t 0.9")
+    p_prefill.add_argument('input_json', help='A kitöltendő exportált JSON fájl.')
+    p_prefill.add_argument('memory', nargs='+', help='Fordítási memóriaként használt, lefordított JSON fájlok.')
+    p_prefill.add_argument('-o', '--output', required=True, help='A kimeneti JSON fájl neve.')
+    p_prefill.add_argument('-t', '--threshold', type=float, default=0.8, help='A közeli találat legkisebb hasonlósága (0-1, alapértelmezett: 0.8).')
+
+    p_serve = subparsers.add_parser('serve', parents=[common], help='NARC fájlok betöltve tartása és más programok kéréseinek kiszolgálása.', epilog="Példák:\n  python %(prog)s serve a003.narc --port 8765\n  python %(prog)s serve a002.narc a003.narc --socket /tmp/narc.sock\n\nA kérések JSON objektumok: {\"op\": \"get\", \"archive\": \"a003\", \"entry\": 12}\nMűveletek: list, get, set (texts vagy text_index + text), rebuild (output), export (output_json / output_dir).\nA HTTP kéréseket Content-Type: application/json fejléccel kell küldeni.")
+    p_serve.add_argument('input_narc', nargs='+', help='A betöltendő NARC fájlok (a kérések a kiterjesztés nélküli fájlnévvel hivatkoznak rájuk).')
+    p_serve.add_argument('--port', type=int, default=8765, help='HTTP port a localhoston (alapértelmezett: 8765).')
+    p_serve.add_argument('--socket', help='HTTP helyett ezen a Unix socketen figyel (soronként egy JSON kérés).')
+
+    p_bench = subparsers.add_parser('bench', parents=[common], help='Teljesítménymérés szintetikus NARC archívumokon.', epilog="Példák:\n  python %(prog)s bench -o baseline.json\n  python %(prog)s bench --baseline baseline.json --threshold 0.15\n  python %(prog)s bench --entries 1000 --strings 50 --length 80 --control 0.1\n  python %(prog)s bench --corpus szovegek.json")
+    p_bench.add_argument('-o', '--output', help='Az eredmények mentése ebbe a JSON fájlba.')
+    p_bench.add_argument('--baseline', help='Összevetés az ebben a JSON fájlban tárolt eredményekkel.')
+    p_bench.add_argument('--threshold', type=float, default=0.10, help='Megengedett lassulás, mielőtt egy fázis visszaesésnek számít (alapértelmezés: 0.10 = 10%%).')
+    p_bench.add_argument('--repeat', type=int, default=3, help='Futások száma fázisonként; a legjobb idő számít.')
+    p_bench.add_argument('--shape', action='append', choices=list(BENCH_SHAPES), help='Beépített archívumforma (ismételhető; alapértelmezés: mind).')
+    p_bench.add_argument('--entries', type=int, help='Egyéni forma: bejegyzések száma.')
+    p_bench.add_argument('--strings', type=int, default=20, help='Egyéni forma: szövegek száma bejegyzésenként.')
+    p_bench.add_argument('--length', type=int, default=40, help='Egyéni forma: átlagos szöveghossz.')
+    p_bench.add_argument('--control', type=float, default=0.05, help='Egyéni forma: a vezérlőkódok aránya a szövegekben.')
+    p_bench.add_argument('--corpus', metavar='JSON', help='Az escape-motor mérése a referenciafüggvényekkel szemben ennek az exportált JSON fájlnak a szövegein (csak ez fut, hacsak nincs --shape vagy --entries).')
+
     if len(sys.argv) == 1:
         parser.print_help(); sys.exit(0)
 
     args = parser.parse_args()
 
+    profiler = cProfile.Profile() if args.profile else None
     try:
         selftest()
-        if args.command == 'export':
-            if not args.output_json and not args.output_dir: p_export.error("Legalább egy kimenetet meg kell adni (-o vagy -d).")
-            narc = NARC.open(args.input_narc)
-            if args.output_json: export_to_json(narc, args.output_json)
-            if args.output_dir: export_to_directory(narc, args.output_dir)
-        elif args.command == 'import':
-            narc = NARC.open(args.narc_original)
-            translations = load_translations(args.input_source, len(narc.entries))
-            if len(translations) != len(narc.entries): print(f"[FIGYELEM] Bejegyzések száma eltér: forrás ({len(translations)}) vs. NARC ({len(narc.entries)}).")
-            new_entries, count = [], 0
-            for i, original in enumerate(narc.entries):
-                if i < len(translations) and any(translations[i]):
-                    new_entries.append(TxtCodec.build_entry(translations[i])); count += 1
-                else: new_entries.append(original)
-            print(f"[INFO] {count} bejegyzés frissítve.")
-            Path(args.narc_output).write_bytes(narc.rebuild(new_entries))
-            print(f"[SIKER] Importálás befejezve! Az új fájl: {args.narc_output}")
+        if profiler: profiler.enable()
+        run_command(args, p_export)
     except Exception as ex:
         print(f'[HIBA] {ex}', file=sys.stderr); sys.exit(1)
+    finally:
+        if profiler: profiler.disable(); profiler.dump_stats(args.profile)
+        if args.stats and STATS.phases: print(STATS.report())
+        if args.stats_json:
+            with open(args.stats_json, 'w', encoding='utf-8') as f: json.dump(STATS.as_dict(), f, indent=2)
+
+def run_command(args, p_export):
+    """Végrehajtja a feldolgozott parancssort."""
+    if args.command == 'export':
+        if not args.output_json and not args.output_dir and not args.index: p_export.error("Legalább egy kimenetet meg kell adni (-o, -d vagy --index).")
+        with worker_pool(args.jobs) as pool: export_archive(args.input_narc, args.output_json, args.output_dir, pool, args.index, args.io_threads)
+    elif args.command == 'show':
+        with open_archive(args.input_narc) as narc:
+            if not 0 <= args.entry < len(narc.entries): raise IndexError(f"A(z) {args.entry}. bejegyzés a tartományon kívül esik (0-{len(narc.entries) - 1}).")
+            texts = narc.strings(args.entry)
+            for j, text in enumerate(texts):
+                if args.text is None or args.text == j: print(f"[{j:04d}] {text}")
+    elif args.command == 'import':
+        with worker_pool(args.jobs) as pool: result = import_archive(args.input_source, args.narc_original, args.narc_output, args.cache_dir, pool, args.io_threads, args.index, args.strict)
+        print(f"[INFO] {result['updated']} bejegyzés frissítve.")
+        if args.cache_dir: print(f"[INFO] {result['cached']} bejegyzés a gyorsítótárból.")
+        if args.index and os.path.isdir(args.input_source): print(f"[INFO] {result['unchanged']} fájl nem változott a legutóbbi importálás óta, ezek az indexből származnak.")
+        print(f"[SIKER] Importálás befejezve! Az új fájl: {args.narc_output}")
+    elif args.command == 'patch':
+        with worker_pool(args.jobs) as pool: result = patch_archive(args.input_source, args.narc, args.output, args.cache_dir, pool, args.strict)
+        print(f"[INFO] {result['updated']} bejegyzés frissítve.")
+        if result['updated']: print(f"[INFO] {result['written']} bájt újraírva a(z) {result['first']}. bejegyzéstől kezdve.")
+        print(f"[SIKER] Javítás befejezve: {args.output or args.narc}")
+    elif args.command == 'watch':
+        session = WatchSession(args.input_source, args.narc_original, args.narc_output)
+        try: session.run(args.interval)
+        except KeyboardInterrupt: print("[INFO] Figyelés leállítva.")
+    elif args.command == 'prefill':
+        if not 0 < args.threshold <= 1: raise ValueError("A küszöbnek 0 és 1 között kell lennie.")
+        memory = TranslationMemory(args.threshold)
+        with STATS.phase('memory'):
+            for path in args.memory: memory.load(path)
+        print(f"[INFO] Fordítási memória: {len(memory.exact)} szöveg.")
+        with STATS.phase('prefill'): counts = prefill_json(args.input_json, memory, args.output)
+        print(f"[INFO] {counts['exact']} pontos és {counts['similar']} hasonló találat kitöltve, {counts['untranslated']} szöveg lefordítatlan maradt.")
+        print(f"[SIKER] Kitöltés befejezve: {args.output}")
+    elif args.command == 'serve':
+        workspace = Workspace(args.input_narc)
+        try: serve(workspace, args.port, args.socket)
+        except KeyboardInterrupt: print("[INFO] Szerver leállítva.")
+        finally: workspace.close()
+    elif args.command == 'diff':
+        result = diff_archives(args.old_narc, args.new_narc)
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f: json.dump(result, f, ensure_ascii=False, indent=2)
+        marks = {'added': '+', 'removed': '-', 'changed': '~'}
+        for c in result['changes']:
+            print(f"{marks[c['status']]} [{c['entry_index']:04d}:{c['text_index']:04d}]")
+            if 'old' in c: print(f"  - {c['old']}")
+            if 'new' in c: print(f"  + {c['new']}")
+        s = result['summary']
+        print(f"[INFO] {s['entries']} bejegyzésből {s['differing_entries']} eltér: {s['added']} szöveg új, {s['removed']} törölt, {s['changed']} módosult.")
+    elif args.command == 'search':
+        if not os.path.isfile(args.index): raise FileNotFoundError(f"A(z) '{args.index}' keresési index nem található.")
+        with SearchIndex(args.index) as db:
+            for path in db.stale(): print(f"[FIGYELEM] A(z) {path} megváltozott az indexelés óta; exportálja újra --index kapcsolóval.", file=sys.stderr)
+            results = db.search(' '.join(args.query), args.limit)
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f: json.dump([{'archive': a, 'entry_index': i, 'text_index': j, 'text': t} for a, i, j, t in results], f, ensure_ascii=False, indent=2)
+        for a, i, j, t in results: print(f"{a} [{i:04d}:{j:04d}] {t}")
+        print(f"[INFO] {len(results)} találat.")
+    elif args.command == 'bench':
+        shapes = {k: BENCH_SHAPES[k] for k in (args.shape or ([] if args.entries or args.corpus else BENCH_SHAPES))}
+        if args.entries: shapes['custom'] = {'entries': args.entries, 'strings': args.strings, 'length': args.length, 'control': args.control}
+        if run_bench(shapes, args.repeat, args.output, args.baseline, args.threshold, args.corpus): sys.exit(1)
+    elif args.command == 'export-batch':
+        out = Path(args.output_dir); out.mkdir(parents=True, exist_ok=True)
+        tasks = []
+        for narc_path, name in find_archives(args.input):
+            target = out / name; target.parent.mkdir(parents=True, exist_ok=True)
+            outputs = (str(target.with_name(target.name + '.json')), None) if args.format == 'json' else (None, str(target))
+            tasks.append(({'narc': str(narc_path), 'output': outputs[0] or outputs[1]}, export_archive, (str(narc_path), *outputs, None, args.index)))
+        if run_batch('export-batch', tasks, args.output_dir, args.jobs): sys.exit(1)
+    elif args.command == 'import-batch':
+        out = Path(args.output_dir); out.mkdir(parents=True, exist_ok=True)
+        tasks = []
+        for narc_path, name in find_archives(args.narc_input):
+            source = Path(args.input_source) / name
+            if source.with_name(source.name + '.json').is_file(): source = source.with_name(source.name + '.json')
+            target = out / name; target.parent.mkdir(parents=True, exist_ok=True)
+            target = target.with_name(target.name + narc_path.suffix)
+            tasks.append(({'narc': str(narc_path), 'source': str(source), 'output': str(target)}, import_archive, (str(source), str(narc_path), str(target), args.cache_dir)))
+        if run_batch('import-batch', tasks, args.output_dir, args.jobs): sys.exit(1)
 
 if __name__ == '__main__':
     main()